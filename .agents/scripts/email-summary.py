@@ -11,6 +11,13 @@ Generates 1-2 sentence summaries for email bodies, stored in the frontmatter
 Usage:
     email-summary.py <markdown-file> [--method auto|heuristic|ollama]
     email-summary.py --update-frontmatter <markdown-file>
+    email-summary.py <markdown-file> --json [--pretty]
+    email-summary.py --jsonl [--method ...] < records.ndjson
+    email-summary.py --batch '<dir-or-glob>' [--method ...] [--update-frontmatter]
+
+Set AIDEVOPS_EMAIL_SUMMARY_CACHE to a file path to cache summaries on disk
+by body hash (e.g. .agents/cache/email-summaries.sqlite in CI); pass
+--no-cache to bypass it for one run.
 
 Part of aidevops framework: https://aidevops.sh
 """
@@ -18,13 +25,19 @@ Part of aidevops framework: https://aidevops.sh
 from __future__ import annotations
 
 import argparse
+import asyncio
+import glob
+import hashlib
 import json
+import os
+import re
+import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 from email_shared import (
-    check_ollama,
-    extract_body,
     extract_frontmatter,
     yaml_escape,
 )
@@ -38,52 +51,169 @@ from email_summary_heuristic import (  # noqa: F401
     _strip_markdown,
     _strip_signature,
     _clean_for_description,
+    _exceeds_word_count,
     _word_count,
     word_count,
+    clean_body_text,
     summarise_heuristic,
     summarise_ollama,
+    summarise_ollama_async,
+    _get_ollama_model,
     _parse_summary_response,
     _clean_llm_summary,
 )
 
+# Maximum concurrent Ollama requests in --batch mode. Match the server's
+# OLLAMA_NUM_PARALLEL so requests are batched rather than queued.
+BATCH_CONCURRENCY = max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "4")))
+
+# Below this many heuristic summaries a process pool's startup and IPC cost
+# outweighs the parallel speedup, so they run inline
+BATCH_POOL_MIN = 64
+
+# Opt-in on-disk summary cache used by the CLI so re-runs over the same
+# corpus skip cleaning and Ollama entirely. Off unless the variable names a
+# file; delete the file to invalidate, or pass --no-cache to bypass it.
+SUMMARY_CACHE_PATH = os.environ.get("AIDEVOPS_EMAIL_SUMMARY_CACHE", "")
+
+
+# ---------------------------------------------------------------------------
+# Summary cache
+# ---------------------------------------------------------------------------
+
+# Open cache connection; None (the default for library callers) disables it
+_summary_cache: Optional[sqlite3.Connection] = None
+
+
+def _open_summary_cache(path: str) -> None:
+    """Open (creating if needed) the summary cache at path.
+
+    Failures are reported and leave caching disabled.
+    """
+    global _summary_cache
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+            "wc INTEGER, method TEXT NOT NULL)"
+        )
+        conn.commit()
+    except (OSError, sqlite3.Error) as e:
+        print(f"WARNING: Summary cache disabled ({path}): {e}", file=sys.stderr)
+        return
+    _summary_cache = conn
+
+
+def _summary_cache_key(body: str, method: str) -> str:
+    """Return the cache key for a body summarised with method."""
+    return hashlib.blake2b(f"{method}\0{body}".encode("utf-8"),
+                           digest_size=16).hexdigest()
+
+
+def _summary_cache_get(key: str) -> Optional[tuple[str, Optional[int], str]]:
+    """Return the cached (summary, word_count, method_used) for key, if any.
+
+    word_count is None for entries written by --batch, which routes without
+    a full count.
+    """
+    try:
+        return _summary_cache.execute(
+            "SELECT summary, wc, method FROM summaries WHERE key = ?", (key,)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+
+
+def _summary_cache_put(rows: list[tuple[str, str, Optional[int], str]]) -> None:
+    """Store (key, summary, word_count, method_used) rows in one transaction."""
+    try:
+        _summary_cache.executemany(
+            "INSERT OR REPLACE INTO summaries (key, summary, wc, method) "
+            "VALUES (?, ?, ?, ?)", rows)
+        _summary_cache.commit()
+    except sqlite3.Error as e:
+        print(f"WARNING: Could not update summary cache: {e}", file=sys.stderr)
+
 
 # ---------------------------------------------------------------------------
 # Main summarisation orchestrator
 # ---------------------------------------------------------------------------
 
-def _summarise_with_ollama_fallback(body: str, wc: int = 0) -> str:
-    """Try Ollama summarisation, fall back to heuristic on failure."""
-    summary = summarise_ollama(body)
+def _summarise_with_ollama_fallback(body: str, wc: int = 0,
+                                    cleaned: Optional[str] = None,
+                                    ) -> tuple[str, str]:
+    """Try Ollama summarisation, fall back to heuristic on failure.
+
+    Returns (summary, method_used).
+    """
+    summary = summarise_ollama(body, cleaned=cleaned)
     if summary:
-        return summary
+        return summary, "ollama"
     if wc > 0:
         print(f"INFO: Using heuristic summary for {wc}-word email "
               f"(Ollama unavailable)", file=sys.stderr)
-    return summarise_heuristic(body)
+    return summarise_heuristic(body, cleaned=cleaned), "heuristic"
 
 
-def _generate_auto_summary(body: str) -> str:
-    """Auto-select summarisation method based on word count."""
-    cleaned = _strip_markdown(body)
+def _generate_summary_uncached(body: str, method: str,
+                               ) -> tuple[str, int, str, bool]:
+    """Summarise body; returns (summary, wc, method_used, cacheable).
+
+    Results are not cacheable when Ollama was wanted but the heuristic had
+    to stand in, so a later run with Ollama available retries it.
+    """
+    cleaned = clean_body_text(body)
     wc = _word_count(cleaned)
 
-    if wc <= WORD_COUNT_THRESHOLD:
-        return summarise_heuristic(body)
+    if method == "ollama":
+        summary, used = _summarise_with_ollama_fallback(body, cleaned=cleaned)
+        return summary, wc, used, used == "ollama"
+    if method == "heuristic" or wc <= WORD_COUNT_THRESHOLD:
+        return summarise_heuristic(body, cleaned=cleaned), wc, "heuristic", True
 
-    # Long email: try Ollama if available, fall back to heuristic
-    if check_ollama():
-        return _summarise_with_ollama_fallback(body, wc)
+    # Long email: summarise_ollama() probes for a model itself (cached), so
+    # no separate availability check is needed before trying it
+    summary, used = _summarise_with_ollama_fallback(body, wc, cleaned=cleaned)
+    return summary, wc, used, used == "ollama"
 
-    print(f"INFO: Using heuristic summary for {wc}-word email "
-          f"(Ollama unavailable)", file=sys.stderr)
-    return summarise_heuristic(body)
 
+def generate_summary_with_meta(body: str, method: str = "auto",
+                               ) -> tuple[str, int, str]:
+    """Generate a summary and report how it was produced.
 
-_SUMMARY_METHODS = {
-    "heuristic": summarise_heuristic,
-    "ollama": _summarise_with_ollama_fallback,
-    "auto": _generate_auto_summary,
-}
+    The body is cleaned once (signature + markdown) and that text is used for
+    the word-count routing, the reported word count and the summariser.
+    When the summary cache is open, results are looked up and stored there.
+
+    Args:
+        body: The email body text (markdown).
+        method: 'auto' (word-count heuristic decides), 'heuristic', or 'ollama'.
+            Unknown values behave like 'auto'.
+
+    Returns:
+        (summary, word_count, method_used) where method_used is 'heuristic'
+        or 'ollama' -- the summariser that actually produced the text.
+    """
+    if not body or not body.strip():
+        return "", 0, "heuristic"
+
+    if _summary_cache is None:
+        return _generate_summary_uncached(body, method)[:3]
+
+    key = _summary_cache_key(body, method)
+    hit = _summary_cache_get(key)
+    if hit is not None:
+        summary, wc, used = hit
+        if wc is None:
+            wc = _word_count(clean_body_text(body))
+        return summary, wc, used
+
+    summary, wc, used, cacheable = _generate_summary_uncached(body, method)
+    if cacheable and summary:
+        _summary_cache_put([(key, summary, wc, used)])
+    return summary, wc, used
 
 
 def generate_summary(body: str, method: str = "auto") -> str:
@@ -96,11 +226,7 @@ def generate_summary(body: str, method: str = "auto") -> str:
     Returns:
         A 1-2 sentence summary string suitable for frontmatter description.
     """
-    if not body or not body.strip():
-        return ""
-
-    handler = _SUMMARY_METHODS.get(method, _generate_auto_summary)
-    return handler(body)
+    return generate_summary_with_meta(body, method)[0]
 
 
 # ---------------------------------------------------------------------------
@@ -111,90 +237,214 @@ def generate_summary(body: str, method: str = "auto") -> str:
 _yaml_escape = yaml_escape
 
 
-def update_description(file_path: str, method: str = "auto") -> bool:
+_DESCRIPTION_LINE_RE = re.compile(r'^description:.*$', re.MULTILINE)
+_TITLE_LINE_RE = re.compile(r'^title:.*$', re.MULTILINE)
+
+
+def _write_description(path: Path, fm_content: str, body: str,
+                       description: str) -> None:
+    """Write content with description: set in already-split frontmatter.
+
+    Replaces an existing description: line, or inserts one after title:
+    (or at the top of the frontmatter when there is no title).
+    """
+    line = f"description: {_yaml_escape(description)}"
+    new_fm, replaced = _DESCRIPTION_LINE_RE.subn(lambda _m: line, fm_content)
+    if not replaced:
+        new_fm, after_title = _TITLE_LINE_RE.subn(
+            lambda m: f"{m.group(0)}\n{line}", fm_content, count=1)
+        if not after_title:
+            new_fm = f"{line}\n{fm_content}"
+
+    path.write_text(f"---\n{new_fm}\n---{body}", encoding="utf-8")
+
+
+def update_description(file_path: str, method: str = "auto",
+                       content: Optional[str] = None) -> bool:
     """Update a markdown file's frontmatter description: field with auto-summary.
 
+    Pass content when the caller already holds the file text to skip the read.
     Returns True if the file was modified.
     """
     path = Path(file_path)
-    content = path.read_text(encoding="utf-8")
+    if content is None:
+        content = path.read_text(encoding="utf-8")
 
     opener, fm_content, body_with_newlines = extract_frontmatter(content)
     if not opener:
         print(f"WARNING: No YAML frontmatter in {file_path}", file=sys.stderr)
         return False
 
-    body = extract_body(content)
-    summary = generate_summary(body, method=method)
-
+    summary = generate_summary(body_with_newlines.strip(), method=method)
     if not summary:
         return False
 
-    # Replace existing description: line in frontmatter
-    fm_lines = fm_content.split("\n")
-    new_fm_lines = []
-    replaced = False
-    for line in fm_lines:
-        if line.startswith("description:"):
-            escaped = _yaml_escape(summary)
-            new_fm_lines.append(f"description: {escaped}")
-            replaced = True
-        else:
-            new_fm_lines.append(line)
-
-    if not replaced:
-        insert_idx = 0
-        for i, line in enumerate(new_fm_lines):
-            if line.startswith("title:"):
-                insert_idx = i + 1
-                break
-        escaped = _yaml_escape(summary)
-        new_fm_lines.insert(insert_idx, f"description: {escaped}")
-
-    new_fm = "\n".join(new_fm_lines)
-    new_content = f"---\n{new_fm}\n---{body_with_newlines}"
-
-    path.write_text(new_content, encoding="utf-8")
+    _write_description(path, fm_content, body_with_newlines, summary)
     return True
 
 
-def update_frontmatter_description(file_path: str, description: str) -> bool:
+def update_frontmatter_description(file_path: str, description: str,
+                                   content: Optional[str] = None) -> bool:
     """Update a markdown file's YAML frontmatter description field.
 
+    Pass content when the caller already holds the file text to skip the read.
     Returns True if the file was modified.
     """
     path = Path(file_path)
-    content = path.read_text(encoding="utf-8")
+    if content is None:
+        content = path.read_text(encoding="utf-8")
 
     opener, fm_content, body = extract_frontmatter(content)
     if not opener:
         print(f"WARNING: No YAML frontmatter in {file_path}", file=sys.stderr)
         return False
 
-    fm_lines = fm_content.split("\n")
-    new_fm_lines = []
-    replaced = False
-    for line in fm_lines:
-        if line.startswith("description:"):
-            new_fm_lines.append(f"description: {_yaml_escape(description)}")
-            replaced = True
+    _write_description(path, fm_content, body, description)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+def _resolve_batch_files(pattern: str) -> list[str]:
+    """Expand a --batch argument (directory or glob) to markdown file paths."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.md")
+    return sorted(p for p in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(p))
+
+
+async def _summarise_llm_batch(
+    bodies: list[str], cleaned: list[str],
+) -> list[tuple[str, str]]:
+    """Summarise bodies concurrently via Ollama, heuristic on any failure.
+
+    Returns (summary, method_used) per body, in input order.
+    """
+    model = _get_ollama_model()
+    if model is None:
+        if bodies:
+            print(f"INFO: Using heuristic summary for {len(bodies)} long "
+                  f"email(s) (Ollama unavailable)", file=sys.stderr)
+        return [(summarise_heuristic(body, cleaned=c), "heuristic")
+                for body, c in zip(bodies, cleaned)]
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def _one(body: str, c: str) -> str:
+        async with sem:
+            return await summarise_ollama_async(body, model, cleaned=c)
+
+    results = await asyncio.gather(
+        *(_one(b, c) for b, c in zip(bodies, cleaned)),
+        return_exceptions=True,
+    )
+    return [
+        (result, "ollama") if isinstance(result, str) and result
+        else (summarise_heuristic(body, cleaned=c), "heuristic")
+        for body, c, result in zip(bodies, cleaned, results)
+    ]
+
+
+def _summarise_heuristic_many(bodies: list[str],
+                              cleaned: list[Optional[str]]) -> list[str]:
+    """Run the heuristic summariser over many bodies, across cores if worthwhile.
+
+    The heuristic is pure CPU-bound regex work with no shared state, so large
+    batches are mapped over a process pool.
+    """
+    if len(bodies) < BATCH_POOL_MIN or (os.cpu_count() or 1) < 2:
+        return [summarise_heuristic(b, c) for b, c in zip(bodies, cleaned)]
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(summarise_heuristic, bodies, cleaned,
+                             chunksize=32))
+
+
+async def _batch_main(bodies: list[str], method: str) -> list[tuple[str, str]]:
+    """Summarise many bodies in one process.
+
+    Short emails go to the heuristic (process pool for large batches) while
+    long emails are sent to Ollama concurrently; both run at the same time.
+    In auto mode each body is cleaned once for routing and the cleaned text
+    is handed to the summariser. Bodies found in the summary cache (when
+    open) are not summarised again.
+    Returns (summary, method_used) per body, in input order.
+    """
+    results: list[tuple[str, str]] = [("", "heuristic")] * len(bodies)
+    llm: tuple[list[int], list[str], list[Optional[str]]] = ([], [], [])
+    heur: tuple[list[int], list[str], list[Optional[str]]] = ([], [], [])
+    keys: dict[int, str] = {}
+
+    for i, body in enumerate(bodies):
+        if not body:
+            continue
+        if _summary_cache is not None:
+            keys[i] = _summary_cache_key(body, method)
+            hit = _summary_cache_get(keys[i])
+            if hit is not None:
+                results[i] = (hit[0], hit[2])
+                continue
+        cleaned = None
+        if method == "auto":
+            cleaned = clean_body_text(body)
+            use_llm = _exceeds_word_count(cleaned, WORD_COUNT_THRESHOLD)
         else:
-            new_fm_lines.append(line)
+            use_llm = method == "ollama"
+        target = llm if use_llm else heur
+        target[0].append(i)
+        target[1].append(body)
+        target[2].append(cleaned)
+
+    llm_task = asyncio.create_task(_summarise_llm_batch(llm[1], llm[2]))
+    heur_summaries = await asyncio.to_thread(_summarise_heuristic_many,
+                                             heur[1], heur[2])
+    for i, summary in zip(heur[0], heur_summaries):
+        results[i] = (summary, "heuristic")
+    for i, result in zip(llm[0], await llm_task):
+        results[i] = result
+
+    if keys:
+        # Heuristic stand-ins for failed Ollama calls are left uncached
+        _summary_cache_put([
+            (keys[i], results[i][0], None, results[i][1])
+            for i in heur[0] + [j for j in llm[0] if results[j][1] == "ollama"]
+            if results[i][0]
+        ])
+    return results
+
+
+def _run_batch(pattern: str, method: str, update: bool) -> int:
+    """Handle --batch mode: NDJSON result per file, optionally updating files.
+
+    Each file is read and split once; the same split is used to write the
+    updated description back.
+    """
+    files = _resolve_batch_files(pattern)
+    if not files:
+        print(f"ERROR: No markdown files match: {pattern}", file=sys.stderr)
+        return 1
 
-    if not replaced:
-        insert_idx = 0
-        for i, line in enumerate(new_fm_lines):
-            if line.startswith("title:"):
-                insert_idx = i + 1
-                break
-        new_fm_lines.insert(insert_idx,
-                            f"description: {_yaml_escape(description)}")
-
-    new_fm = "\n".join(new_fm_lines)
-    new_content = f"---\n{new_fm}\n---{body}"
-
-    path.write_text(new_content, encoding="utf-8")
-    return True
+    parts = [extract_frontmatter(Path(path).read_text(encoding="utf-8"))
+             for path in files]
+    bodies = [body.strip() for _opener, _fm, body in parts]
+    results = asyncio.run(_batch_main(bodies, method))
+
+    failures = 0
+    for path, (opener, fm_content, body), (summary, method_used) in zip(
+            files, parts, results):
+        if update and summary:
+            if opener:
+                _write_description(Path(path), fm_content, body, summary)
+            else:
+                print(f"WARNING: No YAML frontmatter in {path}", file=sys.stderr)
+                failures += 1
+        sys.stdout.write(json.dumps(
+            {"path": path, "summary": summary, "method": method_used},
+            ensure_ascii=False, separators=(",", ":"),
+        ) + "\n")
+    sys.stdout.flush()
+    return 1 if failures else 0
 
 
 # ---------------------------------------------------------------------------
@@ -206,7 +456,10 @@ def _build_cli_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Generate auto-summaries for converted email markdown (t1053.7)"
     )
-    parser.add_argument("input", help="Input markdown file (with YAML frontmatter)")
+    parser.add_argument(
+        "input", nargs="?",
+        help="Input markdown file (with YAML frontmatter)"
+    )
     parser.add_argument(
         "--method", choices=["auto", "heuristic", "ollama"],
         default="auto",
@@ -220,34 +473,105 @@ def _build_cli_parser() -> argparse.ArgumentParser:
         "--json", action="store_true",
         help="Output summary as JSON with metadata"
     )
+    parser.add_argument(
+        "--pretty", action="store_true",
+        help="Indent --json output (default: compact, for piping)"
+    )
+    parser.add_argument(
+        "--jsonl", "--stdin", action="store_true",
+        help='Stream NDJSON records {"path": ..., "body": ...} from stdin '
+             'and write {"path": ..., "summary": ...} lines to stdout'
+    )
+    parser.add_argument(
+        "--batch", metavar="PATTERN",
+        help="Summarise every markdown file in a directory or glob in one "
+             "process (long emails go to Ollama concurrently); writes NDJSON "
+             "results, and updates each file with --update-frontmatter"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Bypass the on-disk summary cache enabled by "
+             "AIDEVOPS_EMAIL_SUMMARY_CACHE=<path>"
+    )
     return parser
 
 
 def _handle_update_frontmatter(
-    summary: str, input_file: str, method: str, wc: int, method_used: str,
+    summary: str, input_file: str, parts: tuple[str, str, str], wc: int,
+    method_used: str,
 ) -> int:
-    """Handle --update-frontmatter output mode. Returns exit code."""
-    if summary and update_description(input_file, method=method):
-        print(f"Updated description in {input_file}")
-        print(f"  Words: {wc}, Method: {method_used}")
-        print(f"  Summary: {summary[:120]}{'...' if len(summary) > 120 else ''}")
-        return 0
+    """Handle --update-frontmatter output mode. Returns exit code.
+
+    parts is the (opener, frontmatter, body) split main() already made, so
+    the file is neither re-read nor re-summarised.
+    """
+    opener, fm_content, body = parts
     if not summary:
         print(f"No summary generated for {input_file}", file=sys.stderr)
-    else:
+        return 1
+    if not opener:
+        print(f"WARNING: No YAML frontmatter in {input_file}", file=sys.stderr)
         print(f"Could not update frontmatter in {input_file}", file=sys.stderr)
-    return 1
+        return 1
+    _write_description(Path(input_file), fm_content, body, summary)
+    print(f"Updated description in {input_file}")
+    print(f"  Words: {wc}, Method: {method_used}")
+    print(f"  Summary: {summary[:120]}{'...' if len(summary) > 120 else ''}")
+    return 0
 
 
-def _handle_json_output(summary: str, wc: int, method_used: str) -> None:
-    """Handle --json output mode."""
+def _handle_json_output(
+    summary: str, wc: int, method_used: str, pretty: bool = False,
+) -> None:
+    """Handle --json output mode.
+
+    Compact separators by default so batch callers piping many files hit the
+    C encoder fast path; --pretty restores the indented form.
+    """
     output = {
         "summary": summary,
         "word_count": wc,
         "method": method_used,
         "char_count": len(summary),
     }
-    print(json.dumps(output, indent=2, ensure_ascii=False))
+    if pretty:
+        print(json.dumps(output, indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(output, ensure_ascii=False, separators=(",", ":")))
+
+
+def _run_jsonl(method: str) -> int:
+    """Handle --jsonl mode: summarise NDJSON records streamed on stdin.
+
+    One process serves many bodies, so callers avoid a Python startup and
+    file round-trip per email. Malformed lines, and records that are not an
+    object with a string (or null/absent) body, are reported and skipped.
+    """
+    failures = 0
+    for lineno, line in enumerate(sys.stdin, 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+            if not isinstance(rec, dict):
+                raise ValueError("record is not a JSON object")
+            body = rec.get("body")
+            if body is None:
+                body = ""
+            elif not isinstance(body, str):
+                raise ValueError(f"body is {type(body).__name__}, not a string")
+        except ValueError as e:
+            print(f"WARNING: Skipping invalid record on line {lineno}: {e}",
+                  file=sys.stderr)
+            failures += 1
+            continue
+        summary = generate_summary(body, method=method)
+        sys.stdout.write(json.dumps(
+            {"path": rec.get("path"), "summary": summary},
+            ensure_ascii=False, separators=(",", ":"),
+        ) + "\n")
+    sys.stdout.flush()
+    return 1 if failures else 0
 
 
 def main() -> int:
@@ -255,28 +579,35 @@ def main() -> int:
     parser = _build_cli_parser()
     args = parser.parse_args()
 
+    if SUMMARY_CACHE_PATH and not args.no_cache:
+        _open_summary_cache(SUMMARY_CACHE_PATH)
+
+    if args.jsonl:
+        return _run_jsonl(args.method)
+    if args.batch:
+        return _run_batch(args.batch, args.method, args.update_frontmatter)
+    if not args.input:
+        parser.error("input is required unless --jsonl or --batch is given")
+
     input_path = Path(args.input)
     if not input_path.is_file():
         print(f"ERROR: File not found: {args.input}", file=sys.stderr)
         return 1
 
+    # Split once; the body, word count and frontmatter are reused below
     content = input_path.read_text(encoding="utf-8")
-    body = extract_body(content)
+    parts = extract_frontmatter(content)
+    body = parts[2].strip()
 
-    if not body.strip():
+    if not body:
         print("WARNING: Empty body text, no summary to generate", file=sys.stderr)
-        summary = ""
-    else:
-        summary = generate_summary(body, method=args.method)
-
-    cleaned_body = _strip_markdown(body)
-    wc = _word_count(cleaned_body)
-    method_used = "heuristic" if wc <= WORD_COUNT_THRESHOLD else "ollama"
+    summary, wc, method_used = generate_summary_with_meta(body, args.method)
 
     if args.update_frontmatter:
-        return _handle_update_frontmatter(summary, args.input, args.method, wc, method_used)
+        return _handle_update_frontmatter(summary, args.input, parts, wc,
+                                          method_used)
     if args.json:
-        _handle_json_output(summary, wc, method_used)
+        _handle_json_output(summary, wc, method_used, pretty=args.pretty)
     else:
         print(summary)
 
@@ -23,62 +23,109 @@ from collections import defaultdict
 from datetime import datetime
 import argparse
 
-from email_frontmatter_utils import parse_frontmatter, update_frontmatter
+from email_frontmatter_utils import (
+    parse_frontmatter_bytes,
+    read_frontmatter_head,
+    update_frontmatter,
+)
 
+# Frontmatter fields written by thread reconstruction
+THREAD_FIELDS = ("thread_id", "thread_position", "thread_length")
 
-def _build_message_id_index(emails) -> dict:
-    """Build a lookup map from message_id to email dict."""
-    return {
-        email.get("message_id", "").strip(): email
-        for email in emails
-        if email.get("message_id", "").strip()
-    }
+# Write buffer for the thread index (bytes)
+INDEX_WRITE_BUFFER = 1 << 20
+
+# Frontmatter fields that link emails into threads
+THREAD_KEY_FIELDS = ("message_id", "in_reply_to")
+
+# Worker threads for reading and rewriting files. The work is I/O-bound, so
+# more threads than cores overlaps read/write latency.
+IO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Below this many files the work runs inline: a pool (and importing
+# concurrent.futures, which pulls in logging) costs more than it saves
+IO_POOL_MIN = 32
 
 
-def _classify_roots_and_children(emails, by_message_id):
-    """Separate emails into root messages and child replies.
+def _map_io(func, items) -> list:
+    """Apply func to each item, on a thread pool for large inputs."""
+    if len(items) < IO_POOL_MIN:
+        return [func(item) for item in items]
+    from concurrent.futures import ThreadPoolExecutor
 
-    Returns (roots, children) where children maps parent_id -> [child_emails].
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as pool:
+        return list(pool.map(func, items))
+
+
+def _thread_columns(emails):
+    """Pull the fields the graph build reads into parallel lists.
+
+    Returns (msg_ids, parent_ids, dates), indexed by row in emails, with ids
+    stripped once. The build then works on row numbers and plain lists
+    instead of repeated dict lookups on every email.
     """
-    children = defaultdict(list)
-    roots = []
+    msg_ids = [email.get("message_id", "").strip() for email in emails]
+    parent_ids = [email.get("in_reply_to", "").strip() for email in emails]
+    dates = [email.get("date_sent", "") for email in emails]
+    return msg_ids, parent_ids, dates
 
-    for email in emails:
-        msg_id = email.get("message_id", "").strip()
-        in_reply_to = email.get("in_reply_to", "").strip()
 
-        if not msg_id:
-            roots.append(email)
-            continue
+def _build_message_id_index(msg_ids) -> dict:
+    """Build a lookup map from message_id to row number."""
+    return {msg_id: row for row, msg_id in enumerate(msg_ids) if msg_id}
 
-        if not in_reply_to or in_reply_to not in by_message_id:
-            roots.append(email)
-        else:
-            children[in_reply_to].append(email)
 
-    return roots, children
+def _classify_roots_and_children(msg_ids, parent_ids, dates, by_message_id):
+    """Separate rows into root messages and child replies.
 
+    Returns (roots, children) where roots is a list of rows and children
+    maps parent_id -> [child rows]. Roots and every child list are sorted by
+    date_sent once here, so the traversal never re-sorts.
+    """
+    children = defaultdict(list)
+    roots = []
 
-def _traverse_thread(email, thread_list, children, position=0):
-    """Recursively traverse thread tree, appending emails in order."""
-    email["thread_position"] = position
-    thread_list.append(email)
+    for row, (msg_id, in_reply_to) in enumerate(zip(msg_ids, parent_ids)):
+        if not msg_id or not in_reply_to or in_reply_to not in by_message_id:
+            roots.append(row)
+        else:
+            children[in_reply_to].append(row)
+
+    date_key = dates.__getitem__
+    roots.sort(key=date_key)
+    for kids in children.values():
+        kids.sort(key=date_key)
+    return roots, children
 
-    msg_id = email.get("message_id", "")
-    if msg_id in children:
-        sorted_children = sorted(
-            children[msg_id], key=lambda e: e.get("date_sent", "")
-        )
-        for child in sorted_children:
-            _traverse_thread(child, thread_list, children, position + 1)
 
+def _traverse_thread(root, emails, thread_id, children, msg_ids):
+    """Traverse a thread tree depth-first; returns its emails in order.
 
-def _annotate_thread(thread_list, thread_id):
-    """Set thread_id and thread_length on all emails in a thread."""
-    length = len(thread_list)
-    for email in thread_list:
-        email["thread_length"] = length
+    Uses an explicit stack so arbitrarily long reply chains cannot hit the
+    recursion limit. children lists must already be sorted by date; they are
+    pushed in reverse so they pop in date order, giving the same pre-order
+    as a recursive walk. thread_id and thread_position are set on each email
+    as it is visited. Duplicate message-ids can link replies into a cycle,
+    so each row is visited at most once.
+    """
+    thread_list = []
+    stack = [(root, 0)]
+    seen = {root}
+    while stack:
+        row, position = stack.pop()
+        email = emails[row]
         email["thread_id"] = thread_id
+        email["thread_position"] = position
+        thread_list.append(email)
+
+        msg_id = msg_ids[row]
+        kids = children.get(msg_id) if msg_id else None
+        if kids:
+            for child in reversed(kids):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append((child, position + 1))
+    return thread_list
 
 
 def build_thread_graph(emails):
@@ -90,15 +137,21 @@ def build_thread_graph(emails):
     Returns:
         dict mapping thread_id (root message_id) to list of emails in thread order
     """
-    by_message_id = _build_message_id_index(emails)
-    roots, children = _classify_roots_and_children(emails, by_message_id)
+    msg_ids, parent_ids, dates = _thread_columns(emails)
+    by_message_id = _build_message_id_index(msg_ids)
+    roots, children = _classify_roots_and_children(
+        msg_ids, parent_ids, dates, by_message_id
+    )
 
     threads = {}
     for root in roots:
-        thread_list = []
-        _traverse_thread(root, thread_list, children)
-        thread_id = root.get("message_id", "") or root["file"]
-        _annotate_thread(thread_list, thread_id)
+        root_email = emails[root]
+        thread_id = root_email.get("message_id", "") or root_email["file"]
+        thread_list = _traverse_thread(root, emails, thread_id, children, msg_ids)
+        # Length is only known once the walk is done
+        length = len(thread_list)
+        for email in thread_list:
+            email["thread_length"] = length
         threads[thread_id] = thread_list
 
     return threads
@@ -117,11 +170,6 @@ def generate_thread_index(threads, output_file):
     2. [<subject>](<file>) - <from> - <date_sent>
     ...
     """
-    lines = ["# Email Threads Index", ""]
-    lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append(f"Total threads: {len(threads)}")
-    lines.append("")
-
     # Resolve the output directory for computing relative paths to email files
     output_dir = Path(output_file).resolve().parent
 
@@ -132,60 +180,95 @@ def generate_thread_index(threads, output_file):
         reverse=True,  # Most recent first
     )
 
-    for thread_id, emails in sorted_threads:
-        if not emails:
-            continue
-
-        root = emails[0]
-        subject = root.get("subject", "No Subject")
-        thread_length = root.get("thread_length", len(emails))
-
-        msg_word = "message" if thread_length == 1 else "messages"
-        lines.append(f"## Thread: {subject} ({thread_length} {msg_word})")
-        lines.append(f"Thread ID: `{thread_id}`")
-        lines.append("")
-
-        for i, email in enumerate(emails, 1):
-            # Compute relative path from index file location to email file
-            # Use pathlib.as_posix() for portable forward-slash Markdown links
-            file_path = Path(
-                os.path.relpath(Path(email["file"]).resolve(), output_dir)
-            ).as_posix()
-            email_subject = email.get("subject", "No Subject")
-            from_addr = email.get("from", "Unknown")
-            date_sent = email.get("date_sent", "Unknown")
-            position = email.get("thread_position", i - 1)
-
-            # Indent replies
-            indent = "  " * position
-            lines.append(
-                f"{indent}{i}. [{email_subject}]({file_path}) - {from_addr} - {date_sent}"
-            )
+    # Lines are streamed through a large write buffer rather than collected
+    # into one list, so memory stays flat however many threads there are
+    with open(output_file, "w", encoding="utf-8", buffering=INDEX_WRITE_BUFFER) as f:
+        w = f.write
+        w("# Email Threads Index\n\n")
+        w(f"Generated: {datetime.now().isoformat(sep=' ', timespec='seconds')}\n")
+        w(f"Total threads: {len(threads)}\n\n")
+
+        for thread_id, emails in sorted_threads:
+            if not emails:
+                continue
+
+            root = emails[0]
+            subject = root.get("subject", "No Subject")
+            thread_length = root.get("thread_length", len(emails))
+
+            msg_word = "message" if thread_length == 1 else "messages"
+            w(f"## Thread: {subject} ({thread_length} {msg_word})\n")
+            w(f"Thread ID: `{thread_id}`\n\n")
+
+            for i, email in enumerate(emails, 1):
+                # Compute relative path from index file location to email file
+                # Use pathlib.as_posix() for portable forward-slash Markdown links
+                file_path = Path(
+                    os.path.relpath(Path(email["file"]).resolve(), output_dir)
+                ).as_posix()
+                email_subject = email.get("subject", "No Subject")
+                from_addr = email.get("from", "Unknown")
+                date_sent = email.get("date_sent", "Unknown")
+                position = email.get("thread_position", i - 1)
+
+                # Indent replies
+                indent = "  " * position
+                w(f"{indent}{i}. [{email_subject}]({file_path}) - {from_addr} - {date_sent}\n")
+
+            w("\n")
+
+    return output_file
 
-        lines.append("")
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines) + "\n")
+def _read_email_file(md_file):
+    """Read one file's frontmatter; returns (metadata or None, raw bytes).
 
-    return output_file
+    Only the head of a large file is read; raw bytes are returned only when
+    they cover the whole file (None otherwise, so an update re-reads it).
+    """
+    data, complete = read_frontmatter_head(md_file)
+    return parse_frontmatter_bytes(data), data if complete else None
 
 
-def _load_emails_from_dir(dir_path) -> list:
+def _list_markdown_files(dir_path) -> list:
+    """Return paths of the .md files directly inside dir_path.
+
+    os.scandir yields names and cached file types without building a Path
+    or matching a pattern per entry.
+    """
+    with os.scandir(dir_path) as it:
+        return [
+            entry.path for entry in it
+            if entry.name.endswith(".md") and entry.is_file()
+        ]
+
+
+def _load_emails_from_dir(dir_path, contents=None) -> list:
     """Parse frontmatter from all .md files in dir_path.
 
     Returns list of metadata dicts with 'file' key added, or empty list.
+    If contents is given, each small file's raw bytes are stored in it by
+    path so the frontmatter update can reuse them instead of re-reading.
     """
-    md_files = list(dir_path.glob("*.md"))
+    md_files = _list_markdown_files(str(dir_path))
     if not md_files:
         print(f"WARNING: No .md files found in {dir_path}", file=sys.stderr)
         return []
 
+    loaded = _map_io(_read_email_file, md_files)
+
     emails = []
-    for md_file in md_files:
-        metadata = parse_frontmatter(md_file)
+    for md_file, (metadata, content) in zip(md_files, loaded):
         if metadata:
-            metadata["file"] = str(md_file)
+            metadata["file"] = md_file
+            # Interned ids are shared by every reply naming the same parent,
+            # and dict lookups on them can match by identity
+            for field in THREAD_KEY_FIELDS:
+                if field in metadata:
+                    metadata[field] = sys.intern(metadata[field])
             emails.append(metadata)
+            if contents is not None and content is not None:
+                contents[metadata["file"]] = content
 
     if not emails:
         print(
@@ -195,21 +278,49 @@ def _load_emails_from_dir(dir_path) -> list:
     return emails
 
 
-def _update_thread_frontmatter(threads) -> int:
+def _existing_thread_fields(emails) -> dict:
+    """Snapshot each file's thread fields as parsed, before they are recomputed.
+
+    Returns a dict mapping file path to a tuple of THREAD_FIELDS values
+    (strings, or None where absent).
+    """
+    return {
+        email["file"]: tuple(email.get(field) for field in THREAD_FIELDS)
+        for email in emails
+    }
+
+
+def _update_thread_frontmatter(threads, existing=None, contents=None) -> int:
     """Write thread_id, thread_position, thread_length into each email's frontmatter.
 
-    Returns count of successfully updated files.
+    Files whose parsed fields in existing already match are left untouched,
+    so re-runs over an unchanged directory do no writes. Content already read
+    for a file (contents, keyed by path) is reused rather than re-read.
+
+    Each file is independent, so large batches of rewrites run on a thread
+    pool.
+
+    Returns count of files whose thread fields are up to date.
     """
+    existing = existing or {}
+    contents = contents or {}
     updated_count = 0
+    # Keyed by path so a file reached twice (duplicate message-ids) gets one
+    # write, with the last values as in a sequential run
+    pending = {}
     for _tid, thread_emails in threads.items():
         for email in thread_emails:
-            new_fields = {
-                "thread_id": email["thread_id"],
-                "thread_position": email["thread_position"],
-                "thread_length": email["thread_length"],
-            }
-            if update_frontmatter(email["file"], new_fields):
+            new_fields = {field: email[field] for field in THREAD_FIELDS}
+            current = tuple(str(value) for value in new_fields.values())
+            if existing.get(email["file"]) == current:
                 updated_count += 1
+                continue
+            pending[email["file"]] = (
+                email["file"], new_fields, contents.get(email["file"])
+            )
+
+    updated_count += sum(_map_io(lambda args: update_frontmatter(*args),
+                                 list(pending.values())))
     return updated_count
 
 
@@ -228,12 +339,14 @@ def reconstruct_threads(directory, output_index=None):
         print(f"ERROR: Directory not found: {directory}", file=sys.stderr)
         sys.exit(1)
 
-    emails = _load_emails_from_dir(dir_path)
+    contents = {}
+    emails = _load_emails_from_dir(dir_path, contents)
     if not emails:
         return {"threads": {}, "updated_count": 0, "index_file": None}
 
+    existing = _existing_thread_fields(emails)
     threads = build_thread_graph(emails)
-    updated_count = _update_thread_frontmatter(threads)
+    updated_count = _update_thread_frontmatter(threads, existing, contents)
 
     if output_index is None:
         output_index = dir_path / "thread-index.md"
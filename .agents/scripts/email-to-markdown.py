@@ -30,6 +30,7 @@ Thread reconstruction:
 import sys
 import argparse
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, NamedTuple
 
@@ -63,6 +64,9 @@ from email_parser import (  # noqa: E402
     extract_header_safe,
     parse_date_safe,
     compute_content_hash,
+    require_hash_algo,
+    HASH_ALGORITHMS,
+    DEDUP_LINK_MODES,
     _parse_email_file,
     _extract_headers,
     _parse_received_date,
@@ -70,6 +74,7 @@ from email_parser import (  # noqa: E402
 from email_normaliser import (  # noqa: E402
     normalise_email_sections,
     build_thread_map,
+    build_thread_info,
     reconstruct_thread,
     generate_thread_index,
     build_frontmatter,
@@ -83,14 +88,25 @@ from email_md_summary import (  # noqa: E402
 )
 
 
+# Worker processes for --batch conversion. Each email is independent once the
+# thread map is built, and parsing/html2text/summaries are CPU-bound Python.
+BATCH_WORKERS = _os.cpu_count() or 1
+
+# Largest number of emails handed to a worker per round trip
+BATCH_CHUNK_MAX = 16
+
+
 class ConvertOptions(NamedTuple):
     """Internal options bundle for email_to_markdown pipeline stages."""
     extract_entities: bool = False
     entity_method: str = 'auto'
     summary_mode: str = 'auto'
     thread_map: Optional[Dict] = None
+    thread_info: Optional[Dict] = None
     dedup_registry: Optional[Dict] = None
     no_normalise: bool = False
+    hash_algo: str = 'sha256'
+    dedup_link: str = 'symlink'
 
 
 class _PipelineData(NamedTuple):
@@ -107,6 +123,27 @@ class _PipelineData(NamedTuple):
     tokens_estimate: int
 
 
+# entity-extraction.py, loaded on first use and then reused for every email
+_entity_mod = None
+
+
+def _load_entity_module():
+    """Load entity-extraction.py once per process; None if it is missing."""
+    global _entity_mod
+    if _entity_mod is None:
+        # Import entity-extraction module dynamically (filename has hyphens)
+        spec = _ilu.spec_from_file_location(
+            "entity_extraction",
+            Path(__file__).parent / "entity-extraction.py"
+        )
+        if spec is None or spec.loader is None:
+            return None
+        mod = _ilu.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        _entity_mod = mod
+    return _entity_mod
+
+
 def run_entity_extraction(body, method='auto'):
     """Run entity extraction on email body text.
 
@@ -117,17 +154,9 @@ def run_entity_extraction(body, method='auto'):
         return {}
 
     try:
-        script_dir = Path(__file__).parent
-        # Import entity-extraction module dynamically (filename has hyphens)
-        import importlib.util
-        spec = importlib.util.spec_from_file_location(
-            "entity_extraction",
-            script_dir / "entity-extraction.py"
-        )
-        if spec is None or spec.loader is None:
+        mod = _load_entity_module()
+        if mod is None:
             return {}
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
         return mod.extract_entities(body, method=method)
     except Exception as e:
         print(f"WARNING: Entity extraction failed: {e}", file=sys.stderr)
@@ -167,12 +196,12 @@ def _add_header_fields(metadata, headers, date_sent, date_received):
         metadata['in_reply_to'] = headers['in_reply_to']
 
 
-def _add_thread_fields(metadata, message_id, thread_map):
+def _add_thread_fields(metadata, message_id, thread_map, thread_info=None):
     """Populate thread reconstruction fields in the metadata dict."""
     if not (thread_map and message_id):
         return
     thread_id, thread_position, thread_length = reconstruct_thread(
-        message_id, thread_map)
+        message_id, thread_map, thread_info)
     if thread_id:
         metadata['thread_id'] = thread_id
         metadata['thread_position'] = thread_position
@@ -192,7 +221,7 @@ def _build_metadata(pipe, opts):
                        pipe.date_received)
 
     _add_thread_fields(metadata, pipe.headers['message_id'],
-                       opts.thread_map)
+                       opts.thread_map, opts.thread_info)
 
     metadata['attachment_count'] = len(pipe.attachments)
     metadata['attachments'] = pipe.attachment_meta
@@ -229,7 +258,9 @@ def email_to_markdown(input_file, output_file=None, attachments_dir=None,
         opts: ConvertOptions instance. If None, defaults are used.
               Use ConvertOptions(summary_mode=..., thread_map=..., etc.) to
               configure entity extraction, summary mode, thread reconstruction,
-              dedup registry, and normalisation.
+              dedup registry, and normalisation. Set thread_info (from
+              build_thread_info) when converting many emails from one
+              thread_map so threads are resolved once, not per email.
     """
     if opts is None:
         opts = ConvertOptions()
@@ -254,7 +285,8 @@ def email_to_markdown(input_file, output_file=None, attachments_dir=None,
         body = normalise_email_sections(body)
 
     # Stage 3: Attachments
-    attachments = extract_attachments(msg, attachments_dir, opts.dedup_registry)
+    attachments = extract_attachments(msg, attachments_dir, opts.dedup_registry,
+                                      opts.hash_algo, opts.dedup_link)
     attachment_meta = _build_attachment_meta(attachments)
 
     # Stage 4: Summary and tokens
@@ -278,10 +310,12 @@ def email_to_markdown(input_file, output_file=None, attachments_dir=None,
     metadata = _build_metadata(pipe, opts)
 
     frontmatter = build_frontmatter(metadata)
-    md_content = f"{frontmatter}\n\n{body}"
-
+    # Written piecewise so a large body is not first copied into a combined
+    # string
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(md_content)
+        f.write(frontmatter)
+        f.write('\n\n')
+        f.write(body)
 
     return {
         'markdown': str(output_file),
@@ -321,11 +355,37 @@ def _build_arg_parser():
     parser.add_argument('--batch', action='store_true',
                         help='Process all .eml/.msg files in input directory '
                              'with thread reconstruction')
+    parser.add_argument('--no-threads', action='store_true',
+                        help='Single-file mode: skip thread reconstruction '
+                             'instead of scanning every email under the '
+                             'input\'s directory')
+    parser.add_argument('--jobs', '-j', type=int, metavar='N',
+                        help='Worker processes for header parsing and batch '
+                             'conversion (default: CPU count; 1 = serial)')
+    parser.add_argument('--thread-cache', metavar='PATH',
+                        help='JSON cache of parsed thread headers, keyed by '
+                             'file path, mtime and size; repeat runs only '
+                             're-parse new or changed emails')
     parser.add_argument('--threads-index', action='store_true',
                         help='Generate thread index files (requires --batch)')
+    parser.add_argument('--compact-index', action='store_true',
+                        help='Write thread index files as compact JSON '
+                             '(no indentation; faster for large batches)')
     parser.add_argument('--dedup-registry',
                         help='Path to JSON dedup registry for cross-email '
-                             'attachment deduplication')
+                             'attachment deduplication (a .jsonl path is '
+                             'kept as an append-only log, written as '
+                             'attachments are saved)')
+    parser.add_argument('--dedup-link', choices=DEDUP_LINK_MODES,
+                        default='symlink',
+                        help='How duplicate attachments link to the first '
+                             'copy (default: symlink; hardlink falls back '
+                             'to symlink across filesystems)')
+    parser.add_argument('--hash-algo', choices=HASH_ALGORITHMS,
+                        default='sha256',
+                        help='Attachment content-hash algorithm (default: '
+                             'sha256; blake3 is faster, needs the blake3 '
+                             'package, and is stored as blake3:<digest>)')
     parser.add_argument('--no-normalise', '--no-normalize',
                         action='store_true',
                         help='Skip email section normalisation (quoted '
@@ -333,6 +393,116 @@ def _build_arg_parser():
     return parser
 
 
+# Options shared by every conversion in a batch worker process
+_worker_opts: Optional[ConvertOptions] = None
+
+
+class _SharedDedupRegistry:
+    """Worker-side view of a dedup registry shared through a Manager dict.
+
+    Every proxy call is a round trip to the manager process, so hashes this
+    worker has already seen are answered from a local dict; only misses and
+    new claims go to the shared dict.
+    """
+
+    def __init__(self, shared):
+        self._shared = shared
+        self._local = {}
+
+    def __contains__(self, content_hash):
+        if content_hash in self._local:
+            return True
+        path = self._shared.get(content_hash)
+        if path is None:
+            return False
+        self._local[content_hash] = path
+        return True
+
+    def __getitem__(self, content_hash):
+        if content_hash not in self:
+            raise KeyError(content_hash)
+        return self._local[content_hash]
+
+    def __setitem__(self, content_hash, path):
+        self._shared[content_hash] = path
+        self._local[content_hash] = path
+
+    def setdefault(self, content_hash, path):
+        path = self._shared.setdefault(content_hash, path)
+        self._local[content_hash] = path
+        return path
+
+
+def _init_batch_worker(opts, shared_registry=None):
+    """Process-pool initializer: receive the batch options once per worker."""
+    global _worker_opts
+    if shared_registry is not None:
+        opts = opts._replace(
+            dedup_registry=_SharedDedupRegistry(shared_registry))
+    _worker_opts = opts
+
+
+def _merge_shared_registry(registry, shared):
+    """Copy entries added or replaced by the workers back into registry.
+
+    Entries are set one by one so a DedupLog registry appends them to its
+    log.
+    """
+    for content_hash, path in shared.items():
+        if registry.get(content_hash) != path:
+            registry[content_hash] = path
+
+
+def _convert_one(email_file, opts=None):
+    """Convert one batch email; returns (email_file, result dict or error)."""
+    try:
+        return email_file, email_to_markdown(
+            email_file,
+            output_file=email_file.with_suffix('.md'),
+            opts=opts or _worker_opts,
+        )
+    except Exception as e:
+        return email_file, e
+
+
+def _convert_batch(email_files, opts, workers=None):
+    """Yield (email_file, result dict or error) in input order.
+
+    Emails are converted on a process pool of up to workers processes
+    (default BATCH_WORKERS). A dedup registry is shared with the workers
+    through a multiprocessing Manager dict and merged back into
+    opts.dedup_registry when the batch finishes. Which copy of a duplicated
+    attachment is kept as the original then depends on worker timing.
+    """
+    workers = min(workers or BATCH_WORKERS, len(email_files))
+    if workers < 2:
+        for email_file in email_files:
+            yield _convert_one(email_file, opts)
+        return
+
+    registry = opts.dedup_registry
+    chunksize = max(1, min(BATCH_CHUNK_MAX, len(email_files) // (workers * 4)))
+    if registry is None:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_batch_worker,
+                                 initargs=(opts,)) as pool:
+            yield from pool.map(_convert_one, email_files, chunksize=chunksize)
+        return
+
+    from multiprocessing import Manager
+
+    with Manager() as manager:
+        # Seed with a plain dict: the registry may be a DedupLog, whose
+        # entries are logged only through the merge below
+        shared = manager.dict(dict(registry))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_batch_worker,
+                                 initargs=(opts._replace(dedup_registry=None),
+                                           shared)) as pool:
+            yield from pool.map(_convert_one, email_files, chunksize=chunksize)
+        _merge_shared_registry(registry, shared.copy())
+
+
 def _run_batch(input_path, args, registry):
     """Process all emails in a directory with thread reconstruction."""
     if not input_path.is_dir():
@@ -341,7 +511,7 @@ def _run_batch(input_path, args, registry):
         sys.exit(1)
 
     print("Building thread map...")
-    thread_map = build_thread_map(input_path)
+    thread_map = build_thread_map(input_path, args.thread_cache, args.jobs)
     print(f"Found {len(thread_map)} emails")
 
     batch_opts = ConvertOptions(
@@ -349,28 +519,28 @@ def _run_batch(input_path, args, registry):
         entity_method=args.entity_method,
         summary_mode=args.summary_mode,
         thread_map=thread_map,
+        thread_info=build_thread_info(thread_map),
         dedup_registry=registry,
         no_normalise=args.no_normalise,
+        hash_algo=args.hash_algo,
+        dedup_link=args.dedup_link,
     )
+    email_files = [Path(info['file_path']) for info in thread_map.values()]
     processed = 0
-    for _message_id, info in thread_map.items():
-        email_file = Path(info['file_path'])
-        try:
-            result = email_to_markdown(
-                email_file,
-                output_file=email_file.with_suffix('.md'),
-                opts=batch_opts,
-            )
+    for email_file, result in _convert_batch(email_files, batch_opts, args.jobs):
+        if isinstance(result, dict):
             processed += 1
             print(f"Processed: {email_file.name} -> {result['markdown']}")
-        except Exception as e:
-            print(f"ERROR processing {email_file}: {e}", file=sys.stderr)
+        else:
+            print(f"ERROR processing {email_file}: {result}", file=sys.stderr)
 
     print(f"\nProcessed {processed}/{len(thread_map)} emails")
 
     if args.threads_index:
         print("\nGenerating thread index files...")
-        threads = generate_thread_index(thread_map, input_path)
+        threads = generate_thread_index(thread_map, input_path,
+                                        compact=args.compact_index,
+                                        thread_info=batch_opts.thread_info)
         print(f"Created {len(threads)} thread index files "
               f"in {input_path}/threads/")
 
@@ -382,10 +552,13 @@ def _run_single(input_path, args, registry):
               file=sys.stderr)
         sys.exit(1)
 
+    # Thread fields need the thread map of every email under the parent
+    # directory; --no-threads skips that scan for one-off conversions
     thread_map = None
-    if input_path.parent.exists():
+    if not args.no_threads and input_path.parent.exists():
         try:
-            thread_map = build_thread_map(input_path.parent)
+            thread_map = build_thread_map(input_path.parent, args.thread_cache,
+                                          args.jobs)
             if thread_map:
                 print(f"Found {len(thread_map)} emails in directory "
                       "for thread reconstruction")
@@ -399,6 +572,8 @@ def _run_single(input_path, args, registry):
         thread_map=thread_map,
         dedup_registry=registry,
         no_normalise=args.no_normalise,
+        hash_algo=args.hash_algo,
+        dedup_link=args.dedup_link,
     )
     result = email_to_markdown(
         args.input, args.output, args.attachments_dir,
@@ -409,12 +584,12 @@ def _run_single(input_path, args, registry):
     if not result['attachments']:
         return
 
-    deduped = sum(1 for a in result['attachments']
-                  if 'deduplicated_from' in a)
+    deduped = [a for a in result['attachments'] if 'deduplicated_from' in a]
     print(f"Extracted {len(result['attachments'])} attachment(s) "
           f"to: {result['attachments_dir']}")
     if deduped:
-        print(f"  ({deduped} deduplicated via symlink)")
+        methods = sorted({a.get('dedup_method', 'symlink') for a in deduped})
+        print(f"  ({len(deduped)} deduplicated via {'/'.join(methods)})")
     for att in result['attachments']:
         suffix = " [dedup]" if 'deduplicated_from' in att else ""
         print(f"  - {att['filename']} "
@@ -424,6 +599,7 @@ def _run_single(input_path, args, registry):
 def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
+    require_hash_algo(args.hash_algo)
 
     registry = None
     if args.dedup_registry:
@@ -9,7 +9,25 @@ Shared between email thread reconstruction, manifest generation, and other
 email pipeline scripts.
 """
 
-import re
+import os
+
+# Frontmatter delimiters. Both are found with a plain find() from offset 4,
+# so the content is never sliced or run through a regex to locate them.
+_FM_START = "---\n"
+_FM_END = "\n---\n"
+_FM_START_B = b"---\n"
+_FM_END_B = b"\n---\n"
+
+# Bytes read per chunk when only the frontmatter of a file is needed
+HEAD_CHUNK_SIZE = 8192
+
+
+def _advise_sequential(f) -> None:
+    """Hint the kernel that f will be read front to back (Linux/BSD only)."""
+    try:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except (AttributeError, OSError):
+        pass
 
 
 def _extract_frontmatter_text(content: str):
@@ -17,116 +35,230 @@ def _extract_frontmatter_text(content: str):
 
     Returns the frontmatter text string, or None if not found.
     """
-    if not content.startswith("---\n"):
+    if not content.startswith(_FM_START):
         return None
-    end_match = re.search(r"\n---\n", content[4:])
-    if not end_match:
+    end = content.find(_FM_END, 4)
+    if end < 0:
         return None
-    return content[4 : 4 + end_match.start()]
+    return content[4:end]
+
+
+def _split_frontmatter_bytes(data: bytes):
+    """Split raw file bytes into (frontmatter_text, body_bytes).
+
+    Only the frontmatter is decoded; the body stays as bytes so it can be
+    written back without a decode/encode round trip. Files with CR line
+    endings are decoded and normalised as text mode would, so they parse as
+    before. Returns (None, None) if no valid frontmatter found.
+    """
+    if data.startswith(_FM_START_B):
+        end = data.find(_FM_END_B, 4)
+        if end >= 0:
+            return data[4:end].decode("utf-8"), data[end + 5:]
+    # Only a "---" opener line can be frontmatter after CR normalisation, and
+    # read_frontmatter_head returns such files whole; any other data may be
+    # a truncated head chunk, cut mid-character, so it must not be decoded
+    if not data.startswith((_FM_START_B, b"---\r")) or b"\r" not in data:
+        return None, None
+    content = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    frontmatter_text, body, _ = _split_frontmatter_body(content)
+    if frontmatter_text is None:
+        return None, None
+    return frontmatter_text, body.encode("utf-8")
 
 
 def _parse_frontmatter_line(line: str):
     """Parse a single frontmatter line into (key, value) or None."""
-    if ":" not in line or line.startswith("  "):
+    # Cheapest rejections first; one find() replaces the `in` scan + partition
+    if not line or line.startswith("  "):
+        return None
+    colon = line.find(":")
+    if colon < 0:
         return None
-    key, _, value = line.partition(":")
-    key = key.strip()
-    value = value.strip()
+    key = line[:colon].strip()
+    value = line[colon + 1:].strip()
     if value.startswith('"') and value.endswith('"'):
         value = value[1:-1]
     return key, value
 
 
+def _parse_frontmatter_text(frontmatter_text: str) -> dict:
+    """Parse frontmatter text into a dict of metadata."""
+    metadata = {}
+    parse_line = _parse_frontmatter_line
+    for line in frontmatter_text.split("\n"):
+        parsed = parse_line(line)
+        if parsed is not None:
+            metadata[parsed[0]] = parsed[1]
+    return metadata
+
+
+def read_frontmatter_head(md_file):
+    """Read only as much of md_file as its frontmatter needs.
+
+    Reads HEAD_CHUNK_SIZE chunks until the closing delimiter is seen, so
+    large bodies are not read just to inspect the header. Files with CR line
+    endings are read whole for the normalising fallback.
+
+    Returns (data, complete) where complete is True if data is the whole file.
+    """
+    with open(md_file, "rb") as f:
+        data = f.read(HEAD_CHUNK_SIZE)
+        if len(data) < HEAD_CHUNK_SIZE:
+            return data, True
+        if data.startswith(_FM_START_B):
+            scanned = 4
+            while data.find(_FM_END_B, scanned) < 0:
+                if scanned == 4:
+                    # Header spans chunks: let readahead fetch the rest
+                    _advise_sequential(f)
+                chunk = f.read(HEAD_CHUNK_SIZE)
+                if not chunk:
+                    return data, True
+                # Re-check the tail in case the delimiter spans chunks
+                scanned = max(4, len(data) - len(_FM_END_B) + 1)
+                data += chunk
+            return data, False
+        if data.startswith(b"---\r"):
+            return data + f.read(), True
+        return data, False
+
+
 def parse_frontmatter(md_file):
     """Extract YAML frontmatter from a markdown file.
 
     Returns dict of metadata, or None if no frontmatter found.
     """
-    with open(md_file, "r", encoding="utf-8") as f:
-        content = f.read()
+    data, _ = read_frontmatter_head(md_file)
+    return parse_frontmatter_bytes(data)
+
+
+def parse_frontmatter_bytes(data: bytes):
+    """Extract YAML frontmatter from a file's raw bytes.
+
+    Returns dict of metadata, or None if no frontmatter found.
+    """
+    frontmatter_text, _ = _split_frontmatter_bytes(data)
+    if frontmatter_text is None:
+        return None
+    return _parse_frontmatter_text(frontmatter_text)
+
 
+def parse_frontmatter_content(content: str):
+    """Extract YAML frontmatter from already-read markdown content.
+
+    Returns dict of metadata, or None if no frontmatter found.
+    """
     frontmatter_text = _extract_frontmatter_text(content)
     if frontmatter_text is None:
         return None
+    return _parse_frontmatter_text(frontmatter_text)
 
-    metadata = {}
-    for line in frontmatter_text.split("\n"):
-        parsed = _parse_frontmatter_line(line)
-        if parsed is not None:
-            key, value = parsed
-            metadata[key] = value
 
-    return metadata
+# Pre-built formatters for the fields thread reconstruction writes on every
+# file, whose types are fixed (thread_id: str, position/length: int)
+_FIELD_FORMATTERS = {
+    "thread_id": lambda v: f'thread_id: "{v}"',
+    "thread_position": lambda v: f"thread_position: {v}",
+    "thread_length": lambda v: f"thread_length: {v}",
+}
 
 
 def _format_field(key, value):
     """Format a YAML frontmatter field as 'key: value' string."""
+    formatter = _FIELD_FORMATTERS.get(key)
+    if formatter is not None:
+        return formatter(value)
     if isinstance(value, str):
         return f'{key}: "{value}"'
     return f"{key}: {value}"
 
 
-def _find_insert_point(lines):
-    """Find insertion point for new fields (after tokens_estimate or at end)."""
-    for i, line in enumerate(lines):
-        if line.startswith("tokens_estimate:"):
-            return i + 1
-    return len(lines)
-
-
-def _update_existing_field(lines, key, value):
-    """Update an existing field in frontmatter lines. Returns True if found."""
-    for i, line in enumerate(lines):
-        if line.startswith(f"{key}:"):
-            lines[i] = _format_field(key, value)
-            return True
-    return False
-
-
 def _split_frontmatter_body(content: str):
     """Split markdown content into (frontmatter_text, body, frontmatter_end).
 
     Returns (None, None, None) if no valid frontmatter found.
     """
-    if not content.startswith("---\n"):
+    if not content.startswith(_FM_START):
         return None, None, None
-    end_match = re.search(r"\n---\n", content[4:])
-    if not end_match:
+    end = content.find(_FM_END, 4)
+    if end < 0:
         return None, None, None
-    frontmatter_end = 4 + end_match.start() + 5  # +5 for '\n---\n'
-    frontmatter_text = content[4 : 4 + end_match.start()]
-    body = content[frontmatter_end:]
-    return frontmatter_text, body, frontmatter_end
+    frontmatter_end = end + 5  # +5 for '\n---\n'
+    return content[4:end], content[frontmatter_end:], frontmatter_end
+
 
+def _apply_new_fields(frontmatter_text: str, new_fields: dict):
+    """Update existing fields and insert the rest by editing the text in place.
 
-def _apply_new_fields(lines: list, new_fields: dict) -> list:
-    """Update existing fields and collect new ones for insertion."""
-    new_lines = []
-    for key, value in new_fields.items():
-        if not _update_existing_field(lines, key, value):
-            new_lines.append(_format_field(key, value))
-    if new_lines:
-        insert_idx = _find_insert_point(lines)
-        lines = lines[:insert_idx] + new_lines + lines[insert_idx:]
-    return lines
+    The first line for each key is replaced; keys not present are inserted
+    after tokens_estimate (or at the end), in new_fields order. Lines are
+    located by offset and untouched regions are copied through as slices.
 
+    Returns the new frontmatter text, or None if it would be unchanged.
+    """
+    pending = {key: _format_field(key, value) for key, value in new_fields.items()}
+    edits = []
+    insert_at = None
+    pos = 0
+    while True:
+        nl = frontmatter_text.find("\n", pos)
+        end = len(frontmatter_text) if nl < 0 else nl
+        colon = frontmatter_text.find(":", pos, end)
+        if colon >= 0:
+            key = frontmatter_text[pos:colon]
+            if key in pending:
+                line = pending.pop(key)
+                if line != frontmatter_text[pos:end]:
+                    edits.append((pos, end, line))
+            elif insert_at is None and key == "tokens_estimate":
+                insert_at = end
+        if nl < 0:
+            break
+        pos = nl + 1
+
+    if pending:
+        if insert_at is None:
+            insert_at = len(frontmatter_text)
+        edits.append((insert_at, insert_at, "\n" + "\n".join(pending.values())))
+        edits.sort(key=lambda edit: edit[0])
+    if not edits:
+        return None
 
-def update_frontmatter(md_file, new_fields):
+    parts = []
+    last = 0
+    for start, end, text in edits:
+        parts.append(frontmatter_text[last:start])
+        parts.append(text)
+        last = end
+    parts.append(frontmatter_text[last:])
+    return "".join(parts)
+
+
+def update_frontmatter(md_file, new_fields, content=None):
     """Update frontmatter in a markdown file with new fields.
 
-    Adds or updates fields in the YAML frontmatter section.
+    Adds or updates fields in the YAML frontmatter section. Pass the file's
+    current raw bytes, if already read, to skip re-reading it. The body is
+    written back byte for byte, and nothing is written if no value changes.
     """
-    with open(md_file, "r", encoding="utf-8") as f:
-        content = f.read()
+    if content is None:
+        with open(md_file, "rb") as f:
+            _advise_sequential(f)
+            content = f.read()
+    elif isinstance(content, str):
+        content = content.encode("utf-8")
 
-    frontmatter_text, body, _ = _split_frontmatter_body(content)
+    frontmatter_text, body = _split_frontmatter_bytes(content)
     if frontmatter_text is None:
         return False
 
-    lines = _apply_new_fields(frontmatter_text.split("\n"), new_fields)
-    new_content = "---\n" + "\n".join(lines) + "\n---\n" + body
+    new_text = _apply_new_fields(frontmatter_text, new_fields)
+    if new_text is None:
+        return True
+    header = "---\n" + new_text + "\n---\n"
 
-    with open(md_file, "w", encoding="utf-8") as f:
-        f.write(new_content)
+    with open(md_file, "wb") as f:
+        f.write(header.encode("utf-8") + body)
 
     return True
@@ -8,12 +8,16 @@ Provides heuristic and LLM-based summarisation. Imported by email_to_markdown.py
 
 import os
 import re
+import functools
 import json
+import socket
 import subprocess
 import urllib.request
 import urllib.error
 from pathlib import Path
 
+from email_shared import is_summary_lead_in, ollama_summary_payload
+
 # Word count threshold: emails with <= this many words use heuristic summary
 SUMMARY_WORD_THRESHOLD = 100
 
@@ -23,6 +27,16 @@ OLLAMA_API_URL = os.environ.get('OLLAMA_API_URL', 'http://localhost:11434/api/ge
 # Ollama model for summarisation
 OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'llama3.2')
 
+# How long Ollama keeps the model loaded after a request. Keeping it resident
+# avoids a model reload (seconds to minutes) between emails in batch mode.
+# A duration ("30m") or seconds; -1 pins indefinitely. For concurrent batch
+# runs, also start the Ollama server with OLLAMA_NUM_PARALLEL set so requests
+# are not serialised.
+OLLAMA_KEEP_ALIVE = os.environ.get('AIDEVOPS_OLLAMA_KEEP_ALIVE', '30m')
+
+# Token budget for the email body in LLM summary prompts
+PROMPT_MAX_TOKENS = int(os.environ.get('AIDEVOPS_LLM_PROMPT_TOKENS', '2000'))
+
 # Anthropic API endpoint (cloud fallback)
 ANTHROPIC_API_URL = 'https://api.anthropic.com/v1/messages'
 
@@ -30,6 +44,24 @@ ANTHROPIC_API_URL = 'https://api.anthropic.com/v1/messages'
 ANTHROPIC_MODEL = 'claude-haiku-4-20250414'
 
 
+# Markdown-stripping patterns, compiled once rather than looked up in the re
+# cache on every call
+_MD_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+_MD_LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_MD_EMPHASIS_RE = re.compile(r'[*_]{1,3}')
+_MD_HEADING_RE = re.compile(r'^#{1,6}\s+', re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Sentence boundary: .!? followed by whitespace
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Leading "Summary:" label or quote in an LLM response
+_SUMMARY_PREFIX_RE = re.compile(r'^(Summary:\s*|"|\')')
+
+# Stop sequences for Ollama: the section labels of the summary prompt below
+_OLLAMA_STOP = ["\n\n", "Subject:", "Body:"]
+
+
 def strip_markdown(text):
     """Strip markdown formatting from text, returning plain text.
 
@@ -37,12 +69,12 @@ def strip_markdown(text):
     """
     if not text:
         return ""
-    text = re.sub(r'!\[([^\]]*)\]\([^)]*\)', r'\1', text)  # images
-    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', text)    # links
-    text = re.sub(r'[*_]{1,3}', '', text)                    # emphasis
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)  # headings
-    text = re.sub(r'\n+', ' ', text)                          # newlines
-    text = re.sub(r'\s+', ' ', text).strip()                  # whitespace
+    text = _MD_IMAGE_RE.sub(r'\1', text)    # images
+    text = _MD_LINK_RE.sub(r'\1', text)     # links
+    text = _MD_EMPHASIS_RE.sub('', text)    # emphasis
+    text = _MD_HEADING_RE.sub('', text)     # headings
+    # \s covers newlines, so one pass collapses both
+    text = _WHITESPACE_RE.sub(' ', text).strip()
     return text
 
 
@@ -72,7 +104,7 @@ def extract_sentences(text, max_sentences=2):
     if not text:
         return ""
     # Split on sentence boundaries: .!? followed by space or end
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    sentences = _SENTENCE_SPLIT_RE.split(text.strip())
     # Filter out very short fragments (< 5 chars) that aren't real sentences
     sentences = [s for s in sentences if len(s.strip()) >= 5]
     if not sentences:
@@ -86,10 +118,39 @@ def extract_sentences(text, max_sentences=2):
     return result
 
 
+def _truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens tokens for an LLM prompt.
+
+    ASCII is counted at ~4 chars per token and any other character as a
+    whole token, so CJK text is not let through at four times the budget.
+    A cut is moved back to a nearby space and marked with '...'.
+    """
+    # Budget in quarter-tokens: 1 per ASCII char, 4 per other char
+    budget = max_tokens * 4
+    head = text[:budget]
+    if not head.isascii():
+        spent = 0
+        for cut, char in enumerate(head):
+            spent += 1 if char.isascii() else 4
+            if spent > budget:
+                head = head[:cut]
+                break
+    if len(head) == len(text):
+        return text
+    space = head.rfind(' ')
+    if space > len(head) // 2:
+        head = head[:space]
+    return head + '...'
+
+
+@functools.lru_cache(maxsize=1)
 def _get_anthropic_api_key():
     """Retrieve Anthropic API key from gopass, credentials file, or environment.
 
     Returns the key string or None if unavailable. Never prints the key.
+    The lookup spawns gopass, so its result (including None) is cached for
+    the life of the process; call _get_anthropic_api_key.cache_clear() to
+    look again.
     """
     # Try gopass first (encrypted)
     try:
@@ -118,23 +179,27 @@ def _get_anthropic_api_key():
     return os.environ.get('ANTHROPIC_API_KEY')
 
 
+# Set once Ollama refuses a connection, so later emails in the same process
+# skip straight to the fallback instead of each paying a failed connect
+_ollama_unreachable = False
+
+
 def _summarise_with_ollama(plain_text, subject):
     """Summarise email body using local Ollama LLM.
 
     Returns summary string or None if Ollama is unavailable.
     """
+    global _ollama_unreachable
+    if _ollama_unreachable:
+        return None
     prompt = (
         "Summarise this email in 1-2 sentences. Be concise and factual. "
         "Return ONLY the summary, no preamble or explanation.\n\n"
         f"Subject: {subject}\n\n"
-        f"Body:\n{plain_text[:3000]}"  # Cap input to avoid context overflow
+        f"Body:\n{_truncate_to_tokens(plain_text, PROMPT_MAX_TOKENS)}"
     )
-    payload = json.dumps({
-        'model': OLLAMA_MODEL,
-        'prompt': prompt,
-        'stream': False,
-        'options': {'temperature': 0.3, 'num_predict': 100}
-    }).encode('utf-8')
+    payload = ollama_summary_payload(OLLAMA_MODEL, prompt, OLLAMA_KEEP_ALIVE,
+                                     _OLLAMA_STOP)
 
     req = urllib.request.Request(
         OLLAMA_API_URL,
@@ -146,13 +211,21 @@ def _summarise_with_ollama(plain_text, subject):
         with urllib.request.urlopen(req, timeout=30) as resp:
             data = json.loads(resp.read().decode('utf-8'))
             summary = data.get('response', '').strip()
-            if summary:
+            # A bare "Here is a summary...:" lead-in falls through to the
+            # Anthropic/heuristic fallback
+            if summary and not is_summary_lead_in(summary):
                 # Clean up: remove quotes, leading "Summary:", etc.
-                summary = re.sub(r'^(Summary:\s*|"|\')', '', summary)
+                summary = _SUMMARY_PREFIX_RE.sub('', summary)
                 summary = summary.rstrip('"\'')
                 return summary
-    except (urllib.error.URLError, urllib.error.HTTPError, OSError,
-            json.JSONDecodeError, KeyError):
+    except urllib.error.HTTPError:
+        pass
+    except urllib.error.URLError as e:
+        # No server listening (or unresolvable host): will not recover
+        # mid-batch. Timeouts and other errors may be transient.
+        if isinstance(e.reason, (ConnectionRefusedError, socket.gaierror)):
+            _ollama_unreachable = True
+    except (OSError, json.JSONDecodeError, KeyError):
         pass
     return None
 
@@ -170,7 +243,7 @@ def _summarise_with_anthropic(plain_text, subject):
         "Summarise this email in 1-2 sentences. Be concise and factual. "
         "Return ONLY the summary, no preamble or explanation.\n\n"
         f"Subject: {subject}\n\n"
-        f"Body:\n{plain_text[:3000]}"
+        f"Body:\n{_truncate_to_tokens(plain_text, PROMPT_MAX_TOKENS)}"
     )
     payload = json.dumps({
         'model': ANTHROPIC_MODEL,
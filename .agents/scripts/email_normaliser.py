@@ -7,6 +7,8 @@ Part of the email-to-markdown pipeline. Imported by email_to_markdown.py.
 """
 
 import re
+from itertools import repeat
+from operator import floordiv
 
 from email_parser import (  # noqa: F401
     parse_eml,
@@ -20,6 +22,7 @@ from email_parser import (  # noqa: F401
 from email_normaliser_sections import (  # noqa: F401
     normalise_email_sections,
     build_thread_map,
+    build_thread_info,
     reconstruct_thread,
     generate_thread_index,
 )
@@ -29,15 +32,20 @@ from email_normaliser_sections import (  # noqa: F401
 # YAML utilities
 # ---------------------------------------------------------------------------
 
+# Units for format_size; each step is a factor of 1024 (2**10)
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
 def format_size(size_bytes):
-    """Format file size in human-readable format."""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024:
-            if unit == 'B':
-                return f"{size_bytes} {unit}"
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.1f} TB"
+    """Format file size in human-readable format.
+
+    The unit comes from the bit length of the size rather than a
+    divide-and-compare loop.
+    """
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    unit = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * unit)):.1f} {_SIZE_UNITS[unit]}"
 
 
 def estimate_tokens(text):
@@ -49,25 +57,29 @@ def estimate_tokens(text):
     """
     if not text:
         return 0
-    words = text.split()
-    token_estimate = 0
-    for word in words:
-        if len(word) <= 4:
-            token_estimate += 1
-        else:
-            token_estimate += max(1, len(word) // 4)
-    return token_estimate
+    lengths = list(map(len, text.split()))
+    # Every word counts len // 4 tokens, except 1-3 char words (0 by that
+    # rule) which count as one; both sums run in C rather than a Python loop
+    return (sum(map(floordiv, lengths, repeat(4)))
+            + lengths.count(1) + lengths.count(2) + lengths.count(3))
+
+
+# Any of these characters forces a double-quoted scalar; one regex scan
+# replaces a substring search per character
+_YAML_QUOTE_CHARS_RE = re.compile(r'[:{}\[\]&*#?|\->!%@`,]')
+
+# Escapes applied inside double quotes, in a single translate pass
+_YAML_QUOTE_TABLE = str.maketrans({'\\': '\\\\', '"': '\\"'})
 
 
 def _needs_yaml_quoting(value: str) -> bool:
     """Check if a YAML value needs quoting (contains special chars)."""
-    special_chars = ':{}[]&*#?|->!%@`,'
-    return any(c in value for c in special_chars)
+    return _YAML_QUOTE_CHARS_RE.search(value) is not None
 
 
 def _yaml_quote(value: str) -> str:
     """Apply YAML double-quoting with escape sequences."""
-    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return '"' + value.translate(_YAML_QUOTE_TABLE) + '"'
 
 
 def yaml_escape(value):
@@ -93,50 +105,49 @@ def yaml_escape(value):
 # Frontmatter building
 # ---------------------------------------------------------------------------
 
-def _format_attachment_yaml(att):
-    """Format a single attachment dict as indented YAML list-item lines."""
-    lines = [f'  - filename: {yaml_escape(att["filename"])}']
+def _format_attachment_yaml(att, lines):
+    """Append a single attachment dict as indented YAML list-item lines."""
+    lines.append(f'  - filename: {yaml_escape(att["filename"])}')
     lines.append(f'    size: {yaml_escape(att["size"])}')
     if 'content_hash' in att:
         lines.append(f'    content_hash: {att["content_hash"]}')
     if 'deduplicated_from' in att:
         lines.append(f'    deduplicated_from: {yaml_escape(att["deduplicated_from"])}')
-    return lines
 
 
-def _format_attachments_yaml(key, attachments):
-    """Format the attachments list as YAML lines."""
+def _format_attachments_yaml(key, attachments, lines):
+    """Append the attachments list as YAML lines."""
     if not attachments:
-        return [f'{key}: []']
-    lines = [f'{key}:']
+        lines.append(f'{key}: []')
+        return
+    lines.append(f'{key}:')
     for att in attachments:
-        lines.extend(_format_attachment_yaml(att))
-    return lines
+        _format_attachment_yaml(att, lines)
 
 
-def _format_entities_yaml(key, entities):
-    """Format the entities dict-of-lists as YAML lines."""
+def _format_entities_yaml(key, entities, lines):
+    """Append the entities dict-of-lists as YAML lines."""
     if not entities:
-        return [f'{key}: {{}}']
-    lines = [f'{key}:']
+        lines.append(f'{key}: {{}}')
+        return
+    lines.append(f'{key}:')
     for entity_type, entity_list in entities.items():
         if not entity_list:
             continue
         lines.append(f'  {entity_type}:')
-        for entity in entity_list:
-            lines.append(f'    - {yaml_escape(entity)}')
-    return lines
+        lines.extend([f'    - {yaml_escape(entity)}' for entity in entity_list])
 
 
-def _format_frontmatter_field(key, value) -> list:
-    """Format a single metadata field as YAML line(s)."""
+def _format_frontmatter_field(key, value, lines) -> None:
+    """Append a single metadata field as YAML line(s) to lines."""
     if key == 'attachments' and isinstance(value, list):
-        return _format_attachments_yaml(key, value)
-    if key == 'entities' and isinstance(value, dict):
-        return _format_entities_yaml(key, value)
-    if isinstance(value, (int, float)):
-        return [f'{key}: {value}']
-    return [f'{key}: {yaml_escape(value)}']
+        _format_attachments_yaml(key, value, lines)
+    elif key == 'entities' and isinstance(value, dict):
+        _format_entities_yaml(key, value, lines)
+    elif isinstance(value, (int, float)):
+        lines.append(f'{key}: {value}')
+    else:
+        lines.append(f'{key}: {yaml_escape(value)}')
 
 
 def build_frontmatter(metadata):
@@ -144,10 +155,11 @@ def build_frontmatter(metadata):
 
     Handles scalar values, lists of dicts (attachments with content_hash
     and optional deduplicated_from), nested dicts of lists (entities),
-    and proper YAML escaping for all string values.
+    and proper YAML escaping for all string values. Every field appends to
+    one shared line list, joined once at the end.
     """
     lines = ['---']
     for key, value in metadata.items():
-        lines.extend(_format_frontmatter_field(key, value))
+        _format_frontmatter_field(key, value, lines)
     lines.append('---')
     return '\n'.join(lines)
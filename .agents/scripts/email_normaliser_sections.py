@@ -9,18 +9,20 @@ replies, signatures, forwarded messages) and thread reconstruction from
 In-Reply-To/Message-ID headers.
 """
 
-import json
+import os
 import re
 import sys
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from email_parser import (
-    parse_eml,
+    parse_eml_headers,
     parse_msg,
     extract_header_safe,
     parse_date_safe,
+    json_dumps_bytes,
+    json_loads,
 )
 
 
@@ -28,11 +30,25 @@ from email_parser import (
 # Section normalisation
 # ---------------------------------------------------------------------------
 
+_FORWARDED_DELIM_RE = re.compile(
+    r'^-{3,}\s*(Forwarded|Original)\s+(message|Message)\s*-{3,}$')
+
+_BEGIN_FORWARDED_RE = re.compile(r'^Begin forwarded message\s*:', re.IGNORECASE)
+
+# Forwarded/original delimiter prefix that ends a signature block
+_FORWARDED_PREFIX_RE = re.compile(r'^-{3,}\s*(Forwarded|Original)')
+
+_QUOTE_PREFIX_RE = re.compile(r'^[>\s]+')
+
+# Characters not allowed in thread index file names
+_UNSAFE_FILENAME_RE = re.compile(r'[<>:/\\|?*]')
+
+
 def _is_forwarded_header(stripped):
     """Check if a line is a forwarded message header delimiter."""
-    if re.match(r'^-{3,}\s*(Forwarded|Original)\s+(message|Message)\s*-{3,}$', stripped):
+    if _FORWARDED_DELIM_RE.match(stripped):
         return True
-    if re.match(r'^Begin forwarded message\s*:', stripped, re.IGNORECASE):
+    if _BEGIN_FORWARDED_RE.match(stripped):
         return True
     return False
 
@@ -56,7 +72,7 @@ def _has_attribution_before(lines, index):
     """Check if the previous line has an 'On ... wrote:' attribution pattern."""
     if index <= 0:
         return False
-    prev = re.sub(r'^[>\s]+', '', lines[index - 1])
+    prev = _QUOTE_PREFIX_RE.sub('', lines[index - 1])
     if _ATTRIBUTION_RE.match(prev):
         return True
     return False
@@ -115,8 +131,7 @@ def _handle_signature(stripped, line, result, state):
     if not state.in_signature:
         return False
     # Inside signature block — check for exit conditions
-    if stripped.startswith('>') or re.match(
-            r'^-{3,}\s*(Forwarded|Original)', stripped):
+    if stripped.startswith('>') or _FORWARDED_PREFIX_RE.match(stripped):
         state.in_signature = False
         return False
     result.append(line)
@@ -205,36 +220,194 @@ def normalise_email_sections(body):
 # Thread reconstruction
 # ---------------------------------------------------------------------------
 
+# Header parsing in build_thread_map costs ~250us of CPU per file plus a
+# file read. Below THREAD_MAP_POOL_MIN files it runs inline; up to
+# THREAD_MAP_PROCESS_MIN a thread pool overlaps the reads; beyond that a
+# process pool (started once, ~100ms) spreads the parsing across cores.
+THREAD_MAP_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+THREAD_MAP_POOL_MIN = 32
+THREAD_MAP_PROCESSES = os.cpu_count() or 1
+THREAD_MAP_PROCESS_MIN = 512
+
+# Files handed to a header-parsing worker process per round trip
+THREAD_MAP_CHUNK = 64
+
+
 def _parse_email_thread_headers(email_file: Path) -> dict:
-    """Parse thread-relevant headers from a single email file."""
+    """Parse thread-relevant headers from a single email file.
+
+    .eml files are read up to the end of their headers only; extract_msg
+    loads .msg bodies and attachments lazily, so only properties are read.
+    """
     ext = email_file.suffix.lower()
-    msg = parse_eml(email_file) if ext == '.eml' else parse_msg(email_file)
+    if ext == '.eml':
+        msg = parse_eml_headers(email_file)
+    else:
+        msg = parse_msg(email_file)
+    # Plain str values: header objects cannot be pickled or JSON-cached
     return {
-        'message_id': extract_header_safe(msg, 'Message-ID'),
-        'in_reply_to': extract_header_safe(msg, 'In-Reply-To'),
+        'message_id': str(extract_header_safe(msg, 'Message-ID')),
+        'in_reply_to': str(extract_header_safe(msg, 'In-Reply-To')),
         'date_sent': parse_date_safe(extract_header_safe(msg, 'Date')),
-        'subject': extract_header_safe(msg, 'Subject', 'No Subject'),
+        'subject': str(extract_header_safe(msg, 'Subject', 'No Subject')),
     }
 
 
-def build_thread_map(emails_dir: Path) -> Dict[str, Dict]:
-    """Build a map of all emails by message-id for thread reconstruction."""
-    thread_map = {}
+def _list_email_files(emails_dir: Path) -> List[Path]:
+    """Return the .eml then .msg files under emails_dir, recursively.
+
+    One os.walk visits each directory once for both extensions, where a
+    glob per extension walked the tree twice. The .eml-before-.msg order is
+    kept so duplicate message-ids resolve as before.
+    """
+    eml_files = []
+    msg_files = []
+    for dirpath, _dirnames, filenames in os.walk(emails_dir):
+        for name in filenames:
+            if name.endswith('.eml'):
+                eml_files.append(Path(dirpath, name))
+            elif name.endswith('.msg'):
+                msg_files.append(Path(dirpath, name))
+    return eml_files + msg_files
+
+
+def _try_parse_thread_headers(email_file: Path):
+    """Return (email_file, headers or the exception raised parsing it)."""
+    try:
+        return email_file, _parse_email_thread_headers(email_file)
+    except Exception as e:
+        return email_file, e
+
+
+def _parse_thread_headers_in_worker(email_file: Path):
+    """_try_parse_thread_headers for a worker process.
+
+    Exceptions are flattened to RuntimeError with the same message, since
+    not every parser exception can be pickled back to the parent.
+    """
+    email_file, headers = _try_parse_thread_headers(email_file)
+    if isinstance(headers, Exception):
+        headers = RuntimeError(str(headers))
+    return email_file, headers
+
+
+def _parse_thread_headers_all(email_files: List[Path],
+                              jobs: Optional[int] = None) -> list:
+    """Parse headers for email_files; returns [(path, headers or exception)].
+
+    Header parsing is mostly CPU-bound Python, so large batches run on a
+    process pool of jobs workers (default: CPU count); mid-sized ones use a
+    thread pool to overlap file reads. jobs=1 always parses serially.
+    Results keep the order of email_files.
+    """
+    if jobs == 1 or len(email_files) < THREAD_MAP_POOL_MIN:
+        return [_try_parse_thread_headers(email_file) for email_file in email_files]
+
+    processes = jobs or THREAD_MAP_PROCESSES
+    if processes > 1 and len(email_files) >= THREAD_MAP_PROCESS_MIN:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(_parse_thread_headers_in_worker, email_files,
+                                 chunksize=THREAD_MAP_CHUNK))
 
-    for ext in ['.eml', '.msg']:
-        for email_file in emails_dir.glob(f'**/*{ext}'):
-            try:
-                headers = _parse_email_thread_headers(email_file)
-                if headers['message_id']:
-                    thread_map[headers['message_id']] = {
-                        'file_path': str(email_file),
-                        'in_reply_to': headers['in_reply_to'],
-                        'date_sent': headers['date_sent'],
-                        'subject': headers['subject'],
-                    }
-            except Exception as e:
-                print(f"Warning: Failed to parse {email_file}: {e}", file=sys.stderr)
-                continue
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=THREAD_MAP_WORKERS) as pool:
+        return list(pool.map(_try_parse_thread_headers, email_files))
+
+
+def _load_thread_cache(cache_path: Path) -> Dict[str, list]:
+    """Load the thread-map header cache, or {} if missing or unreadable.
+
+    Entries map an absolute file path to [mtime_ns, size, headers].
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = json_loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_thread_cache(cache: Dict[str, list], cache_path: Path) -> None:
+    """Write the header cache via a temp file so readers never see it partial."""
+    tmp_path = f'{cache_path}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(json_dumps_bytes(cache))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Failed to write thread cache {cache_path}: {e}",
+              file=sys.stderr)
+
+
+def _parse_thread_headers_cached(email_files: List[Path], cache_path: Path,
+                                 jobs: Optional[int] = None) -> list:
+    """Like _parse_thread_headers_all, reusing cached headers where possible.
+
+    A file is re-parsed only if its mtime or size differs from the cached
+    entry. The cache is rewritten, keeping only files still present, when
+    anything changed.
+    """
+    cache = _load_thread_cache(cache_path)
+    new_cache = {}
+    results = [None] * len(email_files)
+    stale = []
+    for index, email_file in enumerate(email_files):
+        key = os.path.abspath(email_file)
+        try:
+            st = os.stat(key)
+        except OSError as e:
+            results[index] = (email_file, e)
+            continue
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = cache.get(key)
+        if entry and entry[:2] == stamp:
+            results[index] = (email_file, entry[2])
+            new_cache[key] = entry
+        else:
+            stale.append((index, key, stamp))
+
+    reparsed = _parse_thread_headers_all(
+        [email_files[index] for index, _, _ in stale], jobs)
+    for (index, key, stamp), result in zip(stale, reparsed):
+        results[index] = result
+        if not isinstance(result[1], Exception):
+            new_cache[key] = stamp + [result[1]]
+
+    if stale or len(new_cache) != len(cache):
+        _save_thread_cache(new_cache, cache_path)
+    return results
+
+
+def build_thread_map(emails_dir: Path, cache_path: Optional[Path] = None,
+                     jobs: Optional[int] = None) -> Dict[str, Dict]:
+    """Build a map of all emails by message-id for thread reconstruction.
+
+    With cache_path, parsed headers are kept in a JSON cache keyed by path,
+    mtime and size, so repeat runs only parse new or changed files. jobs
+    caps parallel header parsing (1 = serial). Results are merged in
+    discovery order.
+    """
+    email_files = _list_email_files(emails_dir)
+    if cache_path is None:
+        parsed = _parse_thread_headers_all(email_files, jobs)
+    else:
+        parsed = _parse_thread_headers_cached(email_files, Path(cache_path), jobs)
+
+    thread_map = {}
+    for email_file, headers in parsed:
+        if isinstance(headers, Exception):
+            print(f"Warning: Failed to parse {email_file}: {headers}", file=sys.stderr)
+            continue
+        if headers['message_id']:
+            thread_map[headers['message_id']] = {
+                'file_path': str(email_file),
+                'in_reply_to': headers['in_reply_to'],
+                'date_sent': headers['date_sent'],
+                'subject': headers['subject'],
+            }
 
     return thread_map
 
@@ -251,58 +424,106 @@ def _next_ancestor(current_id: str, thread_map: Dict[str, Dict],
     return parent
 
 
-def _walk_ancestor_chain(message_id: str, thread_map: Dict[str, Dict]) -> List[str]:
-    """Walk backwards from message_id to the thread root via in_reply_to."""
-    current_id = message_id
-    chain = [current_id]
-    visited = {current_id}
-
-    while True:
-        parent = _next_ancestor(current_id, thread_map, visited)
+def _build_children_index(thread_map: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """Map each message_id to the message_ids that reply to it."""
+    children: Dict[str, List[str]] = defaultdict(list)
+    for mid, info in thread_map.items():
+        parent = info.get('in_reply_to')
+        if parent:
+            children[parent].append(mid)
+    return children
+
+
+def _count_thread_members(root_id: str, children: Dict[str, List[str]]) -> int:
+    """Count root_id and every message reachable from it through replies."""
+    seen = {root_id}
+    stack = [root_id]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return len(seen)
+
+
+def _resolve_root(message_id: str, thread_map: Dict[str, Dict],
+                  memo: Dict[str, Tuple[str, int]]) -> Tuple[str, int]:
+    """Return (thread_id, 1-based depth) for message_id, memoising the walk.
+
+    Every message on a chain that ends at a true root is cached, so later
+    walks stop as soon as they reach a resolved message. Chains cut short by
+    an in_reply_to cycle are not cached, since their result depends on
+    where the walk started.
+    """
+    path = []
+    visited = set()
+    current = message_id
+    while current not in memo:
+        path.append(current)
+        visited.add(current)
+        parent = _next_ancestor(current, thread_map, visited)
         if not parent:
+            if thread_map[current].get('in_reply_to') in visited:
+                return current, len(path)  # cycle: uncacheable
+            root, depth = current, 0
             break
-        chain.insert(0, parent)
-        visited.add(parent)
-        current_id = parent
-
-    return chain
+        current = parent
+    else:
+        root, depth = memo[current]
 
+    for offset, mid in enumerate(reversed(path), 1):
+        memo[mid] = (root, depth + offset)
+    return memo[message_id]
 
-def _count_descendants(msg_id: str, thread_map: Dict[str, Dict],
-                       visited_desc: set) -> int:
-    """Recursively count all descendants of msg_id in the thread map."""
-    if msg_id in visited_desc:
-        return 0
-    visited_desc.add(msg_id)
-
-    count = 1
-    for mid, info in thread_map.items():
-        if info.get('in_reply_to') == msg_id and mid not in visited_desc:
-            count += _count_descendants(mid, thread_map, visited_desc)
-    return count
 
+def build_thread_info(thread_map: Dict[str, Dict]) -> Dict[str, Tuple[str, int, int]]:
+    """Compute (thread_id, thread_position, thread_length) for every message.
 
-def reconstruct_thread(message_id: str, thread_map: Dict[str, Dict]) -> Tuple[str, int, int]:
+    One pass over thread_map with a reply index and memoised root walks, so
+    the whole map costs O(N) instead of a full-map scan per message.
+    """
+    children = _build_children_index(thread_map)
+    memo: Dict[str, Tuple[str, int]] = {}
+    lengths: Dict[str, int] = {}
+    thread_info = {}
+    for mid in thread_map:
+        thread_id, position = _resolve_root(mid, thread_map, memo)
+        if thread_id not in lengths:
+            lengths[thread_id] = _count_thread_members(thread_id, children)
+        thread_info[mid] = (thread_id, position, lengths[thread_id])
+    return thread_info
+
+
+def reconstruct_thread(message_id: str, thread_map: Dict[str, Dict],
+                       thread_info: Optional[Dict[str, Tuple[str, int, int]]] = None,
+                       ) -> Tuple[str, int, int]:
     """Reconstruct thread information for a given message.
 
+    Pass thread_info from build_thread_info() when looking up many messages
+    from the same map; without it the thread is resolved from scratch.
+
     Returns: (thread_id, thread_position, thread_length)
     """
     if not message_id or message_id not in thread_map:
         return ('', 0, 0)
+    if thread_info is not None:
+        return thread_info.get(message_id, ('', 0, 0))
 
-    chain = _walk_ancestor_chain(message_id, thread_map)
-    thread_id = chain[0]
-    thread_position = chain.index(message_id) + 1
-    thread_length = _count_descendants(thread_id, thread_map, set())
+    thread_id, thread_position = _resolve_root(message_id, thread_map, {})
+    thread_length = _count_thread_members(
+        thread_id, _build_children_index(thread_map))
 
     return (thread_id, thread_position, thread_length)
 
 
-def _group_emails_by_thread(thread_map: Dict[str, Dict]) -> dict:
+def _group_emails_by_thread(thread_map: Dict[str, Dict],
+                            thread_info: Optional[Dict] = None) -> dict:
     """Group all emails in thread_map by their thread_id."""
     threads: dict = defaultdict(list)
+    if thread_info is None:
+        thread_info = build_thread_info(thread_map)
     for message_id, info in thread_map.items():
-        thread_id, position, length = reconstruct_thread(message_id, thread_map)
+        thread_id, position, length = thread_info[message_id]
         if thread_id:
             threads[thread_id].append({
                 'message_id': message_id,
@@ -317,22 +538,35 @@ def _group_emails_by_thread(thread_map: Dict[str, Dict]) -> dict:
     return threads
 
 
-def _write_thread_index_files(threads: dict, threads_dir: Path) -> None:
-    """Write one JSON index file per thread into threads_dir."""
+def _write_thread_index_files(threads: dict, threads_dir: Path,
+                              compact: bool = False) -> None:
+    """Write one JSON index file per thread into threads_dir.
+
+    Each document is encoded in one call (orjson when installed, see
+    json_dumps_bytes) and written once. compact drops indentation.
+    """
     threads_dir.mkdir(parents=True, exist_ok=True)
     for thread_id, emails in threads.items():
-        safe_thread_id = re.sub(r'[<>:/\\|?*]', '_', thread_id)
+        safe_thread_id = _UNSAFE_FILENAME_RE.sub('_', thread_id)
         index_file = threads_dir / f'{safe_thread_id}.json'
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                'thread_id': thread_id,
-                'thread_length': len(emails),
-                'emails': emails
-            }, f, indent=2, ensure_ascii=False)
-
-
-def generate_thread_index(thread_map: Dict[str, Dict], output_dir: Path) -> Dict[str, List[Dict]]:
-    """Generate thread index files grouped by thread_id."""
-    threads = _group_emails_by_thread(thread_map)
-    _write_thread_index_files(threads, output_dir / 'threads')
+        document = json_dumps_bytes({
+            'thread_id': thread_id,
+            'thread_length': len(emails),
+            'emails': emails
+        }, indent=not compact)
+        with open(index_file, 'wb') as f:
+            f.write(document)
+
+
+def generate_thread_index(thread_map: Dict[str, Dict], output_dir: Path,
+                          compact: bool = False,
+                          thread_info: Optional[Dict] = None) -> Dict[str, List[Dict]]:
+    """Generate thread index files grouped by thread_id.
+
+    Set compact to write unindented JSON (smaller and faster to encode).
+    Pass thread_info from build_thread_info() if already computed for this
+    thread_map, so threads are not resolved a second time.
+    """
+    threads = _group_emails_by_thread(thread_map, thread_info)
+    _write_thread_index_files(threads, output_dir / 'threads', compact)
     return dict(threads)
@@ -11,21 +11,111 @@ import os
 import email
 import email.policy
 from email import message_from_binary_file
+from email.parser import BytesHeaderParser
 from email.utils import parsedate_to_datetime
+import functools
 import hashlib
 import json
 import html2text
 from pathlib import Path
 import mimetypes
+from typing import NamedTuple
+
+
+# Set AIDEVOPS_EMAIL_FAST_PARSER=1 to parse .eml files with fast_mail_parser
+# (Rust mailparse core, roughly 8x faster than the email package). Messages
+# it rejects, or every message if it is not installed, use the email package.
+# .msg files and the header-only thread-map reads are unaffected.
+FAST_PARSER = os.environ.get('AIDEVOPS_EMAIL_FAST_PARSER', '') == '1'
+
+# fast_mail_parser module once loaded; False if it is not installed
+_fast_parser_mod = None
+
+
+class _FastAttachment(NamedTuple):
+    """Attachment fields read by _iter_msg_attachments."""
+    longFilename: str
+    shortFilename: str
+    data: bytes
+
+
+class FastMailMessage:
+    """A fast_mail_parser result adapted to the interface the pipeline reads.
+
+    Like an extract_msg Message it has body, htmlBody and attachments, so
+    get_email_body and extract_attachments take their .msg branch; headers
+    are read with get(), as on an email.message.Message.
+    """
+
+    def __init__(self, parsed):
+        # First non-empty part of each type, as _collect_multipart_bodies does
+        self.body = next(filter(None, parsed.text_plain), '')
+        self.htmlBody = next(filter(None, parsed.text_html), '')
+        self.attachments = [
+            _FastAttachment(att.filename, att.filename, att.content)
+            for att in parsed.attachments if att.filename
+        ]
+        self._headers = {name.lower(): value
+                         for name, value in parsed.headers.items()}
+
+    def get(self, header, default=None):
+        """Return a header value by case-insensitive name."""
+        return self._headers.get(header.lower(), default)
+
+
+def _parse_eml_fast(file_path):
+    """Parse file_path with fast_mail_parser; None if unavailable or rejected."""
+    global _fast_parser_mod
+    if _fast_parser_mod is None:
+        try:
+            import fast_mail_parser
+            _fast_parser_mod = fast_mail_parser
+        except ImportError:
+            print("WARNING: fast_mail_parser not installed, using the email "
+                  "package (pip install fast-mail-parser)", file=sys.stderr)
+            _fast_parser_mod = False
+    if not _fast_parser_mod:
+        return None
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    try:
+        return FastMailMessage(_fast_parser_mod.parse_email(data))
+    except _fast_parser_mod.ParseError:
+        return None
 
 
 def parse_eml(file_path):
-    """Parse .eml file using Python's email library."""
+    """Parse .eml file using Python's email library (or see FAST_PARSER)."""
+    if FAST_PARSER:
+        msg = _parse_eml_fast(file_path)
+        if msg is not None:
+            return msg
     with open(file_path, 'rb') as f:
         msg = message_from_binary_file(f, policy=email.policy.default)
     return msg
 
 
+# Header-only parser, shared: each parse builds its own feed parser, so the
+# instance holds no per-message state
+_HEADER_PARSER = BytesHeaderParser(policy=email.policy.default)
+
+
+def parse_eml_headers(file_path):
+    """Parse only the header block of an .eml file.
+
+    Reading stops at the blank line that ends the headers, so the body is
+    neither read nor MIME-decoded. Use when only headers (e.g. for
+    threading) are needed.
+    """
+    head = []
+    with open(file_path, 'rb') as f:
+        for line in f:
+            head.append(line)
+            if line in (b'\n', b'\r\n'):
+                break
+    return _HEADER_PARSER.parsebytes(b''.join(head))
+
+
 def parse_msg(file_path):
     """Parse .msg file using extract_msg library."""
     try:
@@ -39,19 +129,35 @@ def parse_msg(file_path):
     return msg
 
 
-def _collect_multipart_bodies(msg):
+def _collect_multipart_bodies(msg, prefer_html=True):
     """Collect text/plain and text/html from a multipart message.
 
-    Returns (body_text, body_html) taking the first occurrence of each type.
+    Returns (body_text, body_html) taking the first non-empty occurrence of
+    each type. The walk stops as soon as the part get_email_body will return
+    is found (html when prefer_html, else plain text), so later parts are
+    not visited. When html is preferred, plain parts are only decoded if no
+    html body turns up, so body_text is '' whenever body_html is set.
     """
     body_text = ""
     body_html = ""
+    plain_parts = []
     for part in msg.walk():
         content_type = part.get_content_type()
-        if content_type == 'text/plain' and not body_text:
-            body_text = part.get_content()
-        elif content_type == 'text/html' and not body_html:
+        if content_type == 'text/html' and not body_html:
             body_html = part.get_content()
+            if prefer_html and body_html:
+                return "", body_html
+        elif content_type == 'text/plain' and not body_text:
+            if prefer_html:
+                plain_parts.append(part)
+                continue
+            body_text = part.get_content()
+            if body_text:
+                break
+    for part in plain_parts:
+        body_text = part.get_content()
+        if body_text:
+            break
     return body_text, body_html
 
 
@@ -68,33 +174,98 @@ def _collect_singlepart_bodies(msg):
     return "", ""
 
 
-def _extract_mime_parts(msg):
+def _extract_mime_parts(msg, prefer_html=True):
     """Extract text/plain and text/html parts from an email.message.Message.
 
     Returns (body_text, body_html) taking the first occurrence of each type.
     """
     if msg.is_multipart():
-        return _collect_multipart_bodies(msg)
+        return _collect_multipart_bodies(msg, prefer_html)
     return _collect_singlepart_bodies(msg)
 
 
-def _html_to_markdown(html_body):
-    """Convert HTML email body to markdown text."""
-    h = html2text.HTML2Text()
+# HTML-to-markdown backend: 'html2text' (default, pure Python), 'htmd'
+# (htmd-py, Rust, roughly 15x faster), 'markdownify', or 'auto' for the first
+# of those three that is installed. Backends differ in small formatting
+# details (list markers, blank lines), so switching changes output; an
+# unavailable backend falls back to html2text.
+HTML_BACKEND = os.environ.get('AIDEVOPS_EMAIL_HTML_BACKEND', 'html2text')
+
+# Converter callable chosen on first use (per process)
+_html_converter = None
+
+
+def _html2text_convert(html_body):
+    """Convert HTML to markdown with html2text.
+
+    A fresh converter is built per body on purpose: HTML2Text keeps parser
+    state (open blockquotes, lists, <pre>, <style>) across handle() calls,
+    so a shared instance lets one email's unclosed tags corrupt the next.
+    Construction costs microseconds next to the conversion itself.
+    """
+    h = html2text.HTML2Text(bodywidth=0)  # Don't wrap lines
     h.ignore_links = False
     h.ignore_images = False
     h.ignore_emphasis = False
-    h.body_width = 0  # Don't wrap lines
     return h.handle(html_body)
 
 
+def _load_htmd():
+    """Return an htmd-py converter, or None if htmd-py is not installed."""
+    try:
+        import htmd
+    except ImportError:
+        return None
+    options = htmd.create_options_with_skip_tags(['script', 'style'])
+    return lambda html_body: htmd.convert_html(html_body, options)
+
+
+def _load_markdownify():
+    """Return a markdownify converter, or None if markdownify is not installed."""
+    try:
+        from markdownify import markdownify
+    except ImportError:
+        return None
+    return lambda html_body: markdownify(html_body, heading_style='ATX')
+
+
+_HTML_BACKEND_LOADERS = {
+    'htmd': _load_htmd,
+    'markdownify': _load_markdownify,
+}
+
+
+def _select_html_converter(backend):
+    """Resolve a backend name to a converter, falling back to html2text."""
+    if backend == 'auto':
+        names = list(_HTML_BACKEND_LOADERS)
+    else:
+        names = [backend] if backend in _HTML_BACKEND_LOADERS else []
+    for name in names:
+        converter = _HTML_BACKEND_LOADERS[name]()
+        if converter is not None:
+            return converter
+    if backend not in ('auto', 'html2text'):
+        print(f"WARNING: HTML backend '{backend}' unavailable, using html2text",
+              file=sys.stderr)
+    return _html2text_convert
+
+
+def _html_to_markdown(html_body):
+    """Convert HTML email body to markdown text with the configured backend."""
+    global _html_converter
+    if _html_converter is None:
+        _html_converter = _select_html_converter(HTML_BACKEND)
+    return _html_converter(html_body)
+
+
 def get_email_body(msg, prefer_html=True):
     """Extract email body, preferring HTML if available."""
     if hasattr(msg, 'body'):  # extract_msg Message object
         body_text = msg.body or ""
         body_html = msg.htmlBody or ""
     else:  # email.message.Message object
-        body_text, body_html = _extract_mime_parts(msg)
+        body_text, body_html = _extract_mime_parts(msg, prefer_html)
 
     if body_html and prefer_html:
         return _html_to_markdown(body_html)
@@ -102,12 +273,137 @@ def get_email_body(msg, prefer_html=True):
     return body_text
 
 
-def compute_content_hash(data):
-    """Compute SHA-256 hash of binary data.
+# Attachment content-hash algorithms. SHA-256 digests are stored bare (the
+# original format); other algorithms carry an "<algo>:" prefix so a dedup
+# registry shared between runs with different algorithms never mixes keys.
+HASH_ALGORITHMS = ('sha256', 'blake3')
 
-    Returns the hex digest string for use as a content-addressable key.
+
+def require_hash_algo(algo):
+    """Exit with an install hint if algo's hashing library is unavailable."""
+    if algo == 'blake3':
+        try:
+            import blake3  # noqa: F401
+        except ImportError:
+            print("ERROR: blake3 library required for --hash-algo blake3",
+                  file=sys.stderr)
+            print("Install: pip install blake3", file=sys.stderr)
+            sys.exit(1)
+
+
+def compute_content_hash(data, algo='sha256'):
+    """Compute the content hash of binary data.
+
+    Returns the SHA-256 hex digest, or 'blake3:<hex digest>' for
+    algo='blake3' (SIMD and multithreaded, several times faster on large
+    attachments). Used as a content-addressable key.
     """
-    return hashlib.sha256(data).hexdigest()
+    if algo == 'sha256':
+        return hashlib.sha256(data).hexdigest()
+    if algo == 'blake3':
+        import blake3
+        hasher = blake3.blake3(data, max_threads=blake3.blake3.AUTO)
+        return 'blake3:' + hasher.hexdigest()
+    raise ValueError(f"Unsupported hash algorithm: {algo}")
+
+
+# orjson, if installed, encodes and decodes JSON several times faster than
+# the stdlib json module; both produce the same JSON text here
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps_bytes(obj, indent=False) -> bytes:
+    """Encode obj as UTF-8 JSON, indented by 2 or compact, via orjson if present.
+
+    Non-ASCII text is written as UTF-8 rather than \\u escapes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    layout = {'indent': 2} if indent else {'separators': (',', ':')}
+    return json.dumps(obj, ensure_ascii=False, **layout).encode('utf-8')
+
+
+def json_loads(data):
+    """Decode JSON from str or bytes, via orjson if present."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Registry paths with this suffix are append-only JSON-lines logs
+DEDUP_LOG_SUFFIX = '.jsonl'
+
+
+class DedupLog(dict):
+    """Dedup registry backed by an append-only JSON-lines log.
+
+    Every entry set is appended to the log at once, so a batch that dies
+    part-way keeps the attachments it already registered, and no save
+    rewrites the whole registry. Lines are flushed, not fsynced: a process
+    crash loses nothing, a power loss may lose the tail.
+    """
+
+    def __init__(self, log_path, entries=None, log_lines=0, torn_tail=False):
+        super().__init__(entries or {})
+        self.log_path = log_path
+        self.log_lines = log_lines
+        self._torn_tail = torn_tail
+        self._log = None
+
+    def __setitem__(self, content_hash, path):
+        super().__setitem__(content_hash, path)
+        if self._log is None:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            self._log = open(self.log_path, 'a', encoding='utf-8')
+            if self._torn_tail:
+                # End the partial last line so the next entry stays intact
+                self._log.write('\n')
+                self._torn_tail = False
+        self._log.write(json.dumps({'hash': content_hash, 'path': path}) + '\n')
+        self._log.flush()
+        self.log_lines += 1
+
+    def setdefault(self, content_hash, path):
+        # dict.setdefault bypasses __setitem__, so new entries would not be logged
+        if content_hash not in self:
+            self[content_hash] = path
+        return self[content_hash]
+
+    def __reduce__(self):
+        # Pickle and copy as a plain dict snapshot: unpickling a dict
+        # subclass replays __setitem__ before __init__ has run, and a copy
+        # must not append to the same log
+        return dict, (dict(self),)
+
+    def close(self):
+        """Close the log file if it was opened."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def _load_dedup_log(registry_path):
+    """Read a JSON-lines registry log; later lines win.
+
+    A malformed line (e.g. cut short by a crash mid-write) is skipped.
+    """
+    entries = {}
+    log_lines = 0
+    line = '\n'
+    if os.path.isfile(registry_path):
+        with open(registry_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                log_lines += 1
+                try:
+                    entry = json_loads(line)
+                    entries[entry['hash']] = entry['path']
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return DedupLog(registry_path, entries, log_lines,
+                    torn_tail=not line.endswith('\n'))
 
 
 def load_dedup_registry(registry_path):
@@ -115,26 +411,62 @@ def load_dedup_registry(registry_path):
 
     The registry maps content_hash -> first occurrence path, enabling
     symlink-based deduplication across batch email imports.
-    Returns an empty dict if the file doesn't exist.
+    Returns an empty dict if the file doesn't exist. A path ending in
+    DEDUP_LOG_SUFFIX is read as an append-only log and returned as a
+    DedupLog, which records new entries as they are added.
     """
+    if registry_path and registry_path.endswith(DEDUP_LOG_SUFFIX):
+        return _load_dedup_log(registry_path)
     if registry_path and os.path.isfile(registry_path):
-        with open(registry_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(registry_path, 'rb') as f:
+            return json_loads(f.read())
     return {}
 
 
+def _compact_dedup_log(registry):
+    """Rewrite a DedupLog with one line per live entry, via a temp file."""
+    tmp_path = registry.log_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for content_hash, path in registry.items():
+            f.write(json.dumps({'hash': content_hash, 'path': path}) + '\n')
+    os.replace(tmp_path, registry.log_path)
+    registry.log_lines = len(registry)
+
+
 def save_dedup_registry(registry, registry_path):
-    """Persist the deduplication registry to a JSON file."""
+    """Persist the deduplication registry to a JSON file.
+
+    A DedupLog is already on disk; it is only compacted once superseded
+    lines make the log more than twice the size of the live registry.
+    """
+    if isinstance(registry, DedupLog):
+        registry.close()
+        if registry.log_lines > 2 * len(registry):
+            _compact_dedup_log(registry)
+        return
     if registry_path:
         os.makedirs(os.path.dirname(registry_path) or '.', exist_ok=True)
-        with open(registry_path, 'w', encoding='utf-8') as f:
-            json.dump(registry, f, indent=2)
+        with open(registry_path, 'wb') as f:
+            f.write(json_dumps_bytes(registry, indent=True))
 
 
 def _write_file(filepath, data):
-    """Write binary data to filepath."""
-    with open(filepath, 'wb') as f:
-        f.write(data)
+    """Write binary data to filepath.
+
+    The file is opened unbuffered: the payload is already in memory, so a
+    BufferedWriter per attachment only adds setup cost. Raw writes may be
+    short (e.g. >2 GiB on Linux), hence the loop.
+    """
+    with open(filepath, 'wb', buffering=0) as f:
+        view = memoryview(data)
+        while view:
+            view = view[f.write(view):]
+
+
+# How duplicate attachments point at their first occurrence. Hard links
+# cost nothing on later reads (no readlink) and survive the original being
+# moved, but need the same filesystem; across filesystems a symlink is used.
+DEDUP_LINK_MODES = ('symlink', 'hardlink')
 
 
 def _symlink_attachment(filepath, original_path) -> dict:
@@ -151,23 +483,53 @@ def _symlink_attachment(filepath, original_path) -> dict:
     return {'deduplicated_from': original_path}
 
 
-def _save_attachment(filepath, data, content_hash, dedup_registry):
-    """Save an attachment, deduplicating via symlink if hash already seen.
+def _link_attachment(filepath, original_path, link_mode) -> dict:
+    """Link filepath to original_path using link_mode (see DEDUP_LINK_MODES).
+
+    A hard link that fails (e.g. across filesystems) falls back to a
+    symlink. Returns dedup_info with 'deduplicated_from' and, for hard
+    links, 'dedup_method'.
+    """
+    if link_mode == 'hardlink':
+        try:
+            os.link(original_path, str(filepath))
+            return {'deduplicated_from': original_path, 'dedup_method': 'hardlink'}
+        except OSError:
+            pass
+    return _symlink_attachment(filepath, original_path)
+
+
+def _save_attachment(filepath, data, content_hash, dedup_registry,
+                     link_mode='symlink'):
+    """Save an attachment, deduplicating via a link if hash already seen.
 
     Returns a dict with 'deduplicated_from' set when a duplicate is detected.
-    The original file is symlinked rather than copied to save disk space.
+    The original file is linked (symlink by default) rather than copied to
+    save disk space.
     """
     if dedup_registry is None or content_hash not in dedup_registry:
         # First occurrence — write file and register
         _write_file(filepath, data)
-        if dedup_registry is not None:
-            dedup_registry[content_hash] = str(filepath)
-        return {}
-
-    # Duplicate detected — symlink to first occurrence if it still exists
+        if dedup_registry is None:
+            return {}
+        # setdefault, so a registry shared by parallel workers keeps the
+        # first claim; a worker that lost the race links to the winner
+        original_path = dedup_registry.setdefault(content_hash, str(filepath))
+        if original_path == str(filepath):
+            return {}
+        os.remove(filepath)
+        return _link_attachment(filepath, original_path, link_mode)
+
+    # Duplicate detected — link to first occurrence if it still exists
     original_path = dedup_registry[content_hash]
+    if original_path == str(filepath):
+        # Re-run over the same output: this file is the registered original
+        _write_file(filepath, data)
+        return {}
     if os.path.exists(original_path):
-        return _symlink_attachment(filepath, original_path)
+        if os.path.lexists(filepath):
+            os.remove(filepath)  # link or copy left by an earlier run
+        return _link_attachment(filepath, original_path, link_mode)
 
     # Original no longer exists — write normally and become new canonical
     _write_file(filepath, data)
@@ -175,11 +537,13 @@ def _save_attachment(filepath, data, content_hash, dedup_registry):
     return {}
 
 
-def _process_one_attachment(filename, data, output_path, dedup_registry):
+def _process_one_attachment(filename, data, output_path, dedup_registry,
+                            hash_algo='sha256', link_mode='symlink'):
     """Save a single attachment and return its metadata dict."""
     filepath = output_path / filename
-    content_hash = compute_content_hash(data)
-    dedup_info = _save_attachment(filepath, data, content_hash, dedup_registry)
+    content_hash = compute_content_hash(data, hash_algo)
+    dedup_info = _save_attachment(filepath, data, content_hash, dedup_registry,
+                                  link_mode)
     att_meta = {
         'filename': filename,
         'path': str(filepath),
@@ -209,12 +573,15 @@ def _iter_eml_attachments(msg):
             yield filename, part.get_payload(decode=True)
 
 
-def extract_attachments(msg, output_dir, dedup_registry=None):
+def extract_attachments(msg, output_dir, dedup_registry=None, hash_algo='sha256',
+                        link_mode='symlink'):
     """Extract attachments from email message with content-hash deduplication.
 
-    Each attachment gets a SHA-256 content_hash. When dedup_registry is provided,
-    duplicate attachments are symlinked to the first occurrence instead of being
-    written again, and a 'deduplicated_from' field is added to their metadata.
+    Each attachment gets a content_hash (SHA-256 unless hash_algo selects
+    another of HASH_ALGORITHMS). When dedup_registry is provided,
+    duplicate attachments are linked (link_mode: symlink or hardlink) to the
+    first occurrence instead of being written again, and a
+    'deduplicated_from' field is added to their metadata.
     """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -225,7 +592,8 @@ def extract_attachments(msg, output_dir, dedup_registry=None):
         att_iter = _iter_eml_attachments(msg)
 
     return [
-        _process_one_attachment(filename, data, output_path, dedup_registry)
+        _process_one_attachment(filename, data, output_path, dedup_registry,
+                                hash_algo, link_mode)
         for filename, data in att_iter
     ]
 
@@ -256,8 +624,18 @@ def extract_header_safe(msg, header, default=''):
         return msg.get(header, default) or default
 
 
+# Distinct Date strings remembered by parse_date_safe. Each email's date is
+# parsed once for the thread map and again during conversion.
+DATE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
 def parse_date_safe(date_str):
-    """Parse a date string to ISO format, returning original on failure."""
+    """Parse a date string to ISO format, returning original on failure.
+
+    Results are memoised: parsedate_to_datetime is a pure-Python tokenizer
+    and the same header string always gives the same result.
+    """
     if not date_str or date_str == 'Unknown':
         return ''
     try:
@@ -7,12 +7,17 @@ Provides common functions used by email-summary.py and entity-extraction.py:
 - Markdown frontmatter parsing (extract_body, extract_frontmatter)
 - YAML value escaping (yaml_escape)
 - Ollama availability checks (check_ollama, get_ollama_model)
+- Ollama summary request bodies (ollama_summary_payload, ollama_keep_alive)
+- LLM summary response checks (is_summary_lead_in)
 
 Part of aidevops framework: https://aidevops.sh
 """
 
 from __future__ import annotations
 
+import functools
+import json
+import re
 import subprocess
 from typing import Optional
 
@@ -21,15 +26,6 @@ from typing import Optional
 # Markdown body extraction (strip frontmatter)
 # ---------------------------------------------------------------------------
 
-def extract_body(content: str) -> str:
-    """Extract the body text from a markdown file, stripping YAML frontmatter."""
-    if content.startswith("---"):
-        end = content.find("\n---", 3)
-        if end != -1:
-            return content[end + 4:].strip()
-    return content.strip()
-
-
 def extract_frontmatter(content: str) -> tuple[str, str, str]:
     """Split content into (opener, frontmatter_content, body).
 
@@ -47,10 +43,33 @@ def extract_frontmatter(content: str) -> tuple[str, str, str]:
     return ("---\n", fm_content, body)
 
 
+def extract_body(content: str) -> str:
+    """Extract the body text from a markdown file, stripping YAML frontmatter.
+
+    Callers that also need the frontmatter should call extract_frontmatter()
+    once and strip its body rather than scanning the content twice.
+    """
+    return extract_frontmatter(content)[2].strip()
+
+
 # ---------------------------------------------------------------------------
 # YAML escaping
 # ---------------------------------------------------------------------------
 
+# Any of these characters forces a double-quoted scalar (one scan, not one
+# per character)
+_YAML_SPECIAL_RE = re.compile(r'[:#{}\[\],&*?|\-<>=!%@`\n\r"\']')
+
+# Escapes applied inside double quotes: backslash and quote escaped, newlines
+# folded to spaces, carriage returns dropped
+_YAML_QUOTED_TABLE = str.maketrans({
+    '\\': '\\\\',
+    '"': '\\"',
+    '\n': ' ',
+    '\r': None,
+})
+
+
 def yaml_escape(value: Optional[str]) -> str:
     """Escape a string value for safe YAML output.
 
@@ -64,15 +83,10 @@ def yaml_escape(value: Optional[str]) -> str:
     value = str(value)
     if not value:
         return '""'
-    needs_quoting = any(c in value for c in [
-        ':', '#', '{', '}', '[', ']', ',', '&', '*', '?', '|',
-        '-', '<', '>', '=', '!', '%', '@', '`', '\n', '\r', '"', "'"
-    ])
-    needs_quoting = needs_quoting or value.startswith((' ', '\t'))
+    needs_quoting = (_YAML_SPECIAL_RE.search(value) is not None
+                     or value.startswith((' ', '\t')))
     if needs_quoting:
-        value = value.replace('\\', '\\\\').replace('"', '\\"')
-        value = value.replace('\n', ' ').replace('\r', '')
-        return f'"{value}"'
+        return f'"{value.translate(_YAML_QUOTED_TABLE)}"'
     return value
 
 
@@ -80,8 +94,14 @@ def yaml_escape(value: Optional[str]) -> str:
 # Ollama availability helpers
 # ---------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=1)
 def run_ollama_list() -> Optional[subprocess.CompletedProcess]:
-    """Run 'ollama list' and return the result, or None on failure."""
+    """Run 'ollama list' and return the result, or None on failure.
+
+    Cached for the life of the process so check_ollama() and
+    get_ollama_model() share one subprocess probe across many emails.
+    Call run_ollama_list.cache_clear() to force a re-probe.
+    """
     try:
         result = subprocess.run(
             ["ollama", "list"],
@@ -134,3 +154,74 @@ def get_ollama_model(preferred_models: Optional[list[str]] = None) -> Optional[s
         return available_models[0]
 
     return None
+
+
+# ---------------------------------------------------------------------------
+# Ollama summary requests
+# ---------------------------------------------------------------------------
+
+# Generation options for summary requests. num_predict (~2 sentences) and
+# the caller's stop sequences cap decoding at the source instead of letting
+# the model ramble and trimming afterwards.
+OLLAMA_SUMMARY_OPTIONS = {
+    "temperature": 0.2,
+    "top_p": 0.9,
+    "num_predict": 80,
+}
+
+# A lead-in such as "Here is a summary of the email:" with nothing after it;
+# the "\n\n" stop sequence cuts decoding off right after it
+_SUMMARY_LEAD_IN_PREFIXES = ("here is", "here's")
+
+
+def _is_integer(value: str) -> bool:
+    """Return True if value is a plain (optionally negative) integer."""
+    return value.removeprefix("-").isdigit()
+
+
+def ollama_keep_alive(value: str):
+    """Convert a keep-alive setting to the form the Ollama API accepts.
+
+    Ollama parses a string keep_alive as a Go duration, which needs a unit
+    ("30m"); a bare number must be sent as a JSON number (seconds, -1 to
+    keep the model loaded indefinitely).
+    """
+    return int(value) if _is_integer(value) else value
+
+
+def ollama_keep_alive_cli(value: str) -> str:
+    """Convert a keep-alive setting for 'ollama run --keepalive'.
+
+    The CLI flag only takes durations, so a bare number gains an "s" unit.
+    """
+    return f"{value}s" if _is_integer(value) else value
+
+
+def ollama_summary_payload(model: str, prompt: str, keep_alive: str,
+                           stop: list[str]) -> bytes:
+    """Build the JSON body of a non-streaming /api/generate summary request.
+
+    Every summariser sends its requests through here, so all of them use
+    the same OLLAMA_SUMMARY_OPTIONS. stop holds the section labels of the
+    caller's own prompt, so decoding ends before the model echoes them.
+    """
+    return json.dumps({
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": ollama_keep_alive(keep_alive),
+        "options": {**OLLAMA_SUMMARY_OPTIONS, "stop": stop},
+    }).encode("utf-8")
+
+
+def is_summary_lead_in(text: str) -> bool:
+    """Return True if an LLM response is only a lead-in, with no summary.
+
+    Such a response should be treated as empty so the caller's fallback
+    runs, rather than being stored as the summary.
+    """
+    text = text.strip()
+    if text.endswith(":"):
+        return True
+    return (text.lower().startswith(_SUMMARY_LEAD_IN_PREFIXES)
+            and ":" not in text)
@@ -11,12 +11,31 @@ and LLM-based summarisation via Ollama.
 
 from __future__ import annotations
 
+import asyncio
+import http.client
+import json
+import os
 import re
 import subprocess
 import sys
+import threading
 from typing import Optional
+from urllib.parse import urlsplit
+
+from email_shared import (
+    check_ollama,
+    get_ollama_model,
+    is_summary_lead_in,
+    ollama_keep_alive_cli,
+    ollama_summary_payload,
+)
 
-from email_shared import check_ollama, get_ollama_model
+# Optional linear-time (DFA) engine for the lookaround-free markdown patterns;
+# falls back to the stdlib backtracking engine when google-re2 is absent
+try:
+    import re2 as _re_linear
+except ImportError:
+    _re_linear = re
 
 
 # ---------------------------------------------------------------------------
@@ -35,44 +54,57 @@ MAX_DESCRIPTION_LEN = 300
 # Maximum text sent to Ollama (chars) to avoid context overflow
 OLLAMA_MAX_CHARS = 6000
 
+# Keep the model resident between calls so batch runs don't pay a reload per
+# email: a duration ("30m") or seconds (-1 pins indefinitely)
+OLLAMA_KEEP_ALIVE = os.environ.get("AIDEVOPS_OLLAMA_KEEP_ALIVE", "30m")
 
-# ---------------------------------------------------------------------------
-# Text cleaning
-# ---------------------------------------------------------------------------
+# Ollama server address (same variable the ollama CLI honours)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
 
-def _strip_markdown(text: str) -> str:
-    """Strip markdown formatting from text for summarisation input."""
-    # Remove images
-    text = re.sub(r'!\[([^\]]*)\]\([^)]*\)', r'\1', text)
-    # Remove links but keep text
-    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', text)
-    # Remove emphasis markers
-    text = re.sub(r'[*_]{1,3}', '', text)
-    # Remove headings markers
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
-    # Remove blockquote markers (email replies)
-    text = re.sub(r'^>\s*', '', text, flags=re.MULTILINE)
-    # Remove list items
-    text = re.sub(r'^[-*+]\s+', '', text, flags=re.MULTILINE)
-    # Remove ordered lists
-    text = re.sub(r'^\d+\.\s+', '', text, flags=re.MULTILINE)
-    # Remove inline code
-    text = re.sub(r'`[^`]*`', '', text)
-    # Remove code blocks
-    text = re.sub(r'```[\s\S]*?```', '', text)
-    # Remove horizontal rules
-    text = re.sub(r'^[-*_]{3,}\s*$', '', text, flags=re.MULTILINE)
-    # Collapse whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
+# Seconds to wait for a single summary generation
+OLLAMA_TIMEOUT = 60
 
 
-def _strip_signature(text: str) -> str:
-    """Remove email signature from text before summarising.
+# ---------------------------------------------------------------------------
+# Text cleaning
+# ---------------------------------------------------------------------------
 
-    Detects common signature markers and removes everything after them.
-    """
-    sig_patterns = [
+# Markdown stripping, fused into one alternation so the body is scanned and
+# copied once instead of once per construct. Alternatives are ordered so the
+# longer constructs win at a given position (code blocks before inline code,
+# horizontal rules before list/emphasis markers). Line-start prefixes may
+# stack (e.g. "> - item", "## 1. Step"). Flags are inline so the pattern
+# compiles unchanged under re2.
+_MD_FUSED_RE = _re_linear.compile(
+    r'(?m)(?P<block>```[\s\S]*?```)'
+    r'|(?P<icode>`[^`]*`)'
+    r'|!\[(?P<img>[^\]]*)\]\([^)]*\)'
+    r'|\[(?P<link>[^\]]*)\]\([^)]*\)'
+    r'|(?P<hr>^[-*_]{3,}\s*$)'
+    r'|(?P<prefix>^(?:#{1,6}\s+|>\s*|[-*+]\s+|\d+\.\s+)+)'
+    r'|(?P<emph>[*_]{1,3})'
+)
+# Characters at least one of which must be present for any construct other
+# than an ordered-list prefix to match; plain-text bodies skip the fused pass
+_MD_SENTINELS = '[`#>*_-+'
+_MD_ORDERED_LIST_RE = _re_linear.compile(r'(?m)^\d+\.\s')
+# Markup allowed inside kept link/image text
+_MD_INLINE_RE = re.compile(r'`[^`]*`|[*_]{1,3}')
+_MD_BLANK_RUN_RE = re.compile(r'\n{3,}')
+
+
+def _md_dispatch(match) -> str:
+    """Replacement callback for _MD_FUSED_RE: keep link/image text only."""
+    kind = match.lastgroup
+    if kind in ("img", "link"):
+        return _MD_INLINE_RE.sub('', match.group(kind))
+    return ''
+
+
+# Signature markers, checked in order; everything after the first accepted
+# match is dropped
+_SIG_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
         r'\n--\s*\n',                          # standard -- delimiter
         r'\n_{3,}\s*\n',                        # ___ underscores
         r'\n-{3,}\s*\n',                        # --- dashes
@@ -83,25 +115,57 @@ def _strip_signature(text: str) -> str:
         r'\nThank you[,.]?\s*\n',
         r'\nCheers[,.]?\s*\n',
         r'\nSincerely[,.]?\s*\n',
-        r'\nSent from my ',
-        r'\nGet Outlook for ',
-    ]
-
-    for pattern in sig_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            before = text[:match.start()].strip()
-            if len(before) >= 20 and (len(text) < 500 or match.start() > len(text) * 0.2):
-                text = before
-                break
+    )
+]
+# Fixed-string markers (lowercase), checked after the patterns with str.find
+_SIG_LITERALS = ("\nsent from my ", "\nget outlook for ")
+
+
+def _strip_markdown(text: str) -> str:
+    """Strip markdown formatting from text for summarisation input."""
+    if (any(c in text for c in _MD_SENTINELS)
+            or _MD_ORDERED_LIST_RE.search(text)):
+        text = _MD_FUSED_RE.sub(_md_dispatch, text)
+    if '\n\n\n' in text:
+        text = _MD_BLANK_RUN_RE.sub('\n\n', text)
+    return text.strip()
+
+
+def _is_signature_cut(text: str, start: int) -> bool:
+    """Return True if a signature marker at start should truncate text.
+
+    Requires meaningful content before the marker, and for longer texts the
+    marker must sit past the first 20% so early sign-offs aren't mistaken
+    for the signature.
+    """
+    if len(text[:start].strip()) < 20:
+        return False
+    return len(text) < 500 or start > len(text) * 0.2
+
+
+def _strip_signature(text: str) -> str:
+    """Remove email signature from text before summarising.
+
+    Detects common signature markers and removes everything after them.
+    """
+    for rx in _SIG_PATTERNS:
+        match = rx.search(text)
+        if match and _is_signature_cut(text, match.start()):
+            return text[:match.start()].strip()
+
+    lower = text.lower()
+    for literal in _SIG_LITERALS:
+        idx = lower.find(literal)
+        if idx != -1 and _is_signature_cut(text, idx):
+            return text[:idx].strip()
 
     return text
 
 
 def _clean_for_description(text: str) -> str:
     """Clean text for use as a YAML description value."""
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    # str.split()/join collapses whitespace in C, no regex engine involved
+    return ' '.join(text.split())
 
 
 def _word_count(text: str) -> int:
@@ -111,6 +175,14 @@ def _word_count(text: str) -> int:
     return len(text.split())
 
 
+def _exceeds_word_count(text: str, limit: int) -> bool:
+    """Return True if text has more than limit words.
+
+    Bounded split: at most limit + 1 pieces are built, however long the text.
+    """
+    return len(text.split(None, limit)) > limit
+
+
 # Public alias for compatibility
 word_count = _word_count
 
@@ -119,8 +191,10 @@ word_count = _word_count
 # Heuristic summariser (short emails)
 # ---------------------------------------------------------------------------
 
+# Greeting words must end at a word boundary, and a hyphen does not count
+# as one: "Hi-fi" and "Hey-day" are content, "Hello—team" is a greeting
 _GREETING_PATTERN = re.compile(
-    r'^(hi|hello|hey|dear|good\s+(morning|afternoon|evening))\b',
+    r'^(hi|hello|hey|dear|good\s+(morning|afternoon|evening))(?!\w|-\w)',
     re.IGNORECASE,
 )
 _LIST_ITEM_PATTERN = re.compile(r'^(\d+[.)]\s+|[-*+]\s+)')
@@ -129,9 +203,14 @@ _SIGNATURE_PATTERN = re.compile(
     re.IGNORECASE,
 )
 
+
+# Sentence boundary, not after common abbreviations. The re module only
+# allows fixed-width lookbehinds, so abbreviations are grouped by length
+# into one alternation per width (3 checks per candidate instead of 14).
 _SENTENCE_END = re.compile(
-    r'(?<!Mr)(?<!Mrs)(?<!Ms)(?<!Dr)(?<!Prof)(?<!Inc)(?<!Ltd)(?<!Corp)'
-    r'(?<!Jr)(?<!Sr)(?<!vs)(?<!etc)(?<!e\.g)(?<!i\.e)'
+    r'(?<!Mr|Ms|Dr|Jr|Sr|vs)'
+    r'(?<!Mrs|Inc|Ltd|etc|e\.g|i\.e)'
+    r'(?<!Prof|Corp)'
     r'[.!?]\s+(?=[A-Z])',
     re.MULTILINE,
 )
@@ -176,10 +255,16 @@ def _split_sentences(text_block: str, max_sentences: int) -> list[str]:
 
 
 def _truncate_to_limit(text: str, limit: int) -> str:
-    """Truncate text at word boundary with ellipsis if over limit."""
+    """Truncate text at word boundary with ellipsis if over limit.
+
+    Shared by every summariser so each result is truncated exactly once.
+    The cut leaves room for the ellipsis, so the result never exceeds limit.
+    """
     if len(text) <= limit:
         return text
-    truncated = text[:limit].rsplit(' ', 1)[0]
+    room = limit - 3
+    cut = text.rfind(' ', 0, room)
+    truncated = text[:cut if cut != -1 else room]
     if not truncated.endswith(('.', '!', '?')):
         truncated += '...'
     return truncated
@@ -194,22 +279,30 @@ def _extract_first_sentences(text: str, max_sentences: int = 2) -> str:
     return _truncate_to_limit(result, MAX_DESCRIPTION_LEN)
 
 
-def summarise_heuristic(body: str) -> str:
-    """Generate a summary using extractive heuristic (first meaningful sentences)."""
+def clean_body_text(body: str) -> str:
+    """Strip the signature and markdown from a body: the summarisers' input.
+
+    Callers that need the cleaned text for routing (word count) can compute
+    it once and pass it to summarise_heuristic/summarise_ollama as cleaned=.
+    """
+    return _strip_markdown(_strip_signature(body))
+
+
+def summarise_heuristic(body: str, cleaned: Optional[str] = None) -> str:
+    """Generate a summary using extractive heuristic (first meaningful sentences).
+
+    cleaned: clean_body_text(body), if the caller already computed it.
+    """
     if not body:
         return ""
-    text = _strip_signature(body)
-    cleaned = _strip_markdown(text)
+    if cleaned is None:
+        cleaned = clean_body_text(body)
     if not cleaned:
         return ""
 
+    # Already truncated by _extract_first_sentences; cleaning only shortens
     summary = _extract_first_sentences(cleaned, max_sentences=2)
-    summary = _clean_for_description(summary)
-
-    if len(summary) > MAX_DESCRIPTION_LEN:
-        summary = summary[:MAX_DESCRIPTION_LEN].rsplit(' ', 1)[0] + '...'
-
-    return summary
+    return _clean_for_description(summary)
 
 
 # ---------------------------------------------------------------------------
@@ -230,54 +323,73 @@ Email:
 
 Summary:"""
 
+# Stop sequences for Ollama: the section labels of the summary prompt above
+_OLLAMA_SUMMARY_STOP = ["\n\n", "Email:", "Summary:"]
+
 
 # Ollama availability: delegated to email_shared
 _check_ollama = check_ollama
 _get_ollama_model = get_ollama_model
 
 
+# Lowercase LLM preambles stripped from the start of a response, in order
+_RESPONSE_PREAMBLES = (
+    "here is a summary:",
+    "here's a summary:",
+    "summary:",
+    "here is the summary:",
+    "here's the summary:",
+)
+_RESPONSE_FENCE_RE = re.compile(r'```.*?```', re.DOTALL)
+_RESPONSE_LABEL_RE = re.compile(
+    r'^(?:summary|here\s+is|the\s+email)\s*[:]\s*', re.IGNORECASE)
+
+
 def _parse_summary_response(response: str) -> str:
-    """Clean up LLM summary response."""
+    """Clean up LLM summary response.
+
+    Returns an empty string for a bare lead-in ("Here is a summary...:")
+    so the caller falls back to the heuristic summary.
+    """
     text = response.strip()
+    if is_summary_lead_in(text):
+        return ""
+
+    # Fast path: the strict prompt usually yields one clean line that the
+    # full cleanup below would return unchanged. isprintable() rules out
+    # newlines, tabs and other whitespace that would be collapsed.
+    if (not text or len(text) <= MAX_DESCRIPTION_LEN
+            and text.isprintable() and '  ' not in text and '`' not in text
+            and text[0] not in '"\'' and text[-1] not in '"\''
+            and not text.lower().startswith(('summary', 'here', 'the email'))):
+        return text
 
     if text.startswith('"') and text.endswith('"'):
         text = text[1:-1]
     if text.startswith("'") and text.endswith("'"):
         text = text[1:-1]
 
-    preambles = [
-        "Here is a summary:",
-        "Here's a summary:",
-        "Summary:",
-        "Here is the summary:",
-        "Here's the summary:",
-    ]
-    for preamble in preambles:
-        if text.lower().startswith(preamble.lower()):
+    low = text.lower()
+    for preamble in _RESPONSE_PREAMBLES:
+        if low.startswith(preamble):
             text = text[len(preamble):].strip()
+            low = text.lower()
 
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-    text = re.sub(r'^(?:summary|here\s+is|the\s+email)\s*[:]\s*',
-                  '', text, flags=re.IGNORECASE)
+    text = _RESPONSE_FENCE_RE.sub('', text)
+    text = _RESPONSE_LABEL_RE.sub('', text)
     text = text.strip('"\'')
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    if len(text) > MAX_DESCRIPTION_LEN:
-        text = text[:MAX_DESCRIPTION_LEN].rsplit(' ', 1)[0]
-        if not text.endswith(('.', '!', '?')):
-            text += '...'
-
-    return text
+    text = ' '.join(text.split())
+    return _truncate_to_limit(text, MAX_DESCRIPTION_LEN)
 
 
 # Keep legacy alias
 _clean_llm_summary = _parse_summary_response
 
 
-def _prepare_ollama_input(body: str) -> Optional[str]:
+def _prepare_ollama_input(body: str, cleaned: Optional[str] = None) -> Optional[str]:
     """Prepare cleaned and truncated text for Ollama. Returns None if empty."""
-    text = _strip_signature(body)
-    cleaned = _strip_markdown(text)
+    if cleaned is None:
+        cleaned = clean_body_text(body)
     if not cleaned:
         return None
     if len(cleaned) > OLLAMA_MAX_CHARS:
@@ -285,12 +397,89 @@ def _prepare_ollama_input(body: str) -> Optional[str]:
     return cleaned
 
 
+# Persistent HTTP connection to the Ollama server, reused across emails.
+# Held per thread so concurrent batch requests never share a socket.
+_ollama_local = threading.local()
+
+
+def _ollama_connection() -> http.client.HTTPConnection:
+    """Return this thread's Ollama HTTP connection, creating it on first use."""
+    conn = getattr(_ollama_local, "conn", None)
+    if conn is None:
+        host = OLLAMA_HOST if "://" in OLLAMA_HOST else f"http://{OLLAMA_HOST}"
+        parts = urlsplit(host)
+        conn = http.client.HTTPConnection(
+            parts.hostname or "127.0.0.1", parts.port or 11434,
+            timeout=OLLAMA_TIMEOUT,
+        )
+        _ollama_local.conn = conn
+    return conn
+
+
+def _reset_ollama_connection() -> None:
+    """Close and forget this thread's connection so the next call reconnects."""
+    conn = getattr(_ollama_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _ollama_local.conn = None
+
+
+def _run_ollama_http(model: str, prompt: str) -> Optional[str]:
+    """Generate via Ollama's /api/generate endpoint over a reused connection.
+
+    Returns the parsed response, empty string on a server-side failure, or
+    None if the server could not be reached (caller may fall back to the CLI).
+    """
+    payload = ollama_summary_payload(model, prompt, OLLAMA_KEEP_ALIVE,
+                                     _OLLAMA_SUMMARY_STOP)
+    headers = {"Content-Type": "application/json"}
+    # Two attempts: a kept-alive connection may have been closed by the server
+    for _attempt in range(2):
+        conn = _ollama_connection()
+        try:
+            conn.request("POST", "/api/generate", body=payload, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except TimeoutError:
+            _reset_ollama_connection()
+            print(f"WARNING: Ollama summarisation timed out ({OLLAMA_TIMEOUT}s)",
+                  file=sys.stderr)
+            return ""
+        except (http.client.HTTPException, OSError):
+            _reset_ollama_connection()
+            continue
+        if resp.status != 200:
+            print(f"WARNING: Ollama summarisation failed: HTTP {resp.status}",
+                  file=sys.stderr)
+            return ""
+        try:
+            return _parse_summary_response(json.loads(data).get("response", ""))
+        except (json.JSONDecodeError, AttributeError):
+            return ""
+    return None
+
+
+# Set once the ollama binary is found missing, so a batch run does not
+# attempt a fork/exec per email for a CLI that isn't there
+_ollama_cli_missing = False
+
+
 def _run_ollama(model: str, prompt: str) -> str:
-    """Run Ollama and return parsed response, or empty string on failure."""
+    """Run Ollama via the CLI and return parsed response, or '' on failure.
+
+    Fallback for when the HTTP API is unreachable. One-shot per call: the
+    interactive 'ollama run' REPL has no reliable end-of-response framing to
+    multiplex prompts over a persistent stdin, and batch runs normally go
+    through the reused HTTP connection instead.
+    """
+    global _ollama_cli_missing
+    if _ollama_cli_missing:
+        return ""
     try:
         result = subprocess.run(
-            ["ollama", "run", model, prompt],
-            capture_output=True, text=True, timeout=60
+            ["ollama", "run", "--keepalive",
+             ollama_keep_alive_cli(OLLAMA_KEEP_ALIVE), model, prompt],
+            capture_output=True, text=True, timeout=OLLAMA_TIMEOUT
         )
         if result.returncode != 0:
             print(f"WARNING: Ollama summarisation failed: {result.stderr}",
@@ -298,24 +487,47 @@ def _run_ollama(model: str, prompt: str) -> str:
             return ""
         return _parse_summary_response(result.stdout)
     except subprocess.TimeoutExpired:
-        print("WARNING: Ollama summarisation timed out (60s)", file=sys.stderr)
+        print(f"WARNING: Ollama summarisation timed out ({OLLAMA_TIMEOUT}s)",
+              file=sys.stderr)
         return ""
     except FileNotFoundError:
+        _ollama_cli_missing = True
         return ""
 
 
-def summarise_ollama(body: str) -> str:
+def summarise_ollama(body: str, model: Optional[str] = None,
+                     cleaned: Optional[str] = None) -> str:
     """Generate a summary using Ollama LLM.
 
+    Args:
+        body: The email body text (markdown).
+        model: Ollama model name; probed via 'ollama list' when omitted.
+        cleaned: clean_body_text(body), if the caller already computed it.
+
     Returns a 1-2 sentence summary string, or empty string on failure.
     """
-    model = _get_ollama_model()
+    if model is None:
+        model = _get_ollama_model()
     if model is None:
         return ""
 
-    cleaned = _prepare_ollama_input(body)
-    if not cleaned:
+    prepared = _prepare_ollama_input(body, cleaned)
+    if not prepared:
         return ""
 
-    prompt = _OLLAMA_SUMMARY_PROMPT.format(text=cleaned)
-    return _run_ollama(model, prompt)
+    prompt = _OLLAMA_SUMMARY_PROMPT.format(text=prepared)
+    summary = _run_ollama_http(model, prompt)
+    if summary is None:
+        return _run_ollama(model, prompt)
+    return summary
+
+
+async def summarise_ollama_async(body: str, model: Optional[str] = None,
+                                 cleaned: Optional[str] = None) -> str:
+    """Async wrapper around summarise_ollama for concurrent batch use.
+
+    The blocking HTTP call runs in a worker thread, each of which keeps its
+    own persistent connection, so many emails can be in flight at once and
+    the Ollama server (with OLLAMA_NUM_PARALLEL > 1) can batch them.
+    """
+    return await asyncio.to_thread(summarise_ollama, body, model, cleaned)
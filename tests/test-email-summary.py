@@ -7,6 +7,8 @@ Tests the heuristic summariser with various email lengths and formats.
 LLM (Ollama) tests are skipped when Ollama is not available.
 """
 
+import io
+import json
 import os
 import sys
 import tempfile
@@ -41,6 +43,11 @@ class TestWordCount(unittest.TestCase):
         text = "Hello world\nThis is a test\nThird line"
         self.assertEqual(email_summary.word_count(text), 8)
 
+    def test_exceeds_word_count(self):
+        self.assertFalse(email_summary._exceeds_word_count("a b c ", 3))
+        self.assertTrue(email_summary._exceeds_word_count("a  b\nc d", 3))
+        self.assertFalse(email_summary._exceeds_word_count("", 0))
+
 
 class TestStripMarkdown(unittest.TestCase):
     """Test _strip_markdown helper."""
@@ -97,6 +104,34 @@ class TestStripSignature(unittest.TestCase):
         self.assertIn("More content", result)
 
 
+class TestFilterMeaningfulLines(unittest.TestCase):
+    """Test greeting and sign-off detection in _filter_meaningful_lines."""
+
+    def _filter(self, text):
+        import email_summary_heuristic
+
+        return email_summary_heuristic._filter_meaningful_lines(text)
+
+    def test_greetings_stripped(self):
+        for greeting in ("Good  morning team", "Hello\u2014team", "Hi",
+                         "Hey, all", "Dear Bob,", "GOOD EVENING"):
+            with self.subTest(greeting=greeting):
+                self.assertEqual(self._filter(f"{greeting}\nThe report is ready."),
+                                 ["The report is ready."])
+
+    def test_hyphenated_word_not_greeting(self):
+        self.assertEqual(self._filter("Hi-fi results are in"),
+                         ["Hi-fi results are in"])
+
+    def test_word_starting_with_greeting_kept(self):
+        self.assertEqual(self._filter("History is repeating"),
+                         ["History is repeating"])
+
+    def test_signoff_with_nbsp_stops(self):
+        self.assertEqual(self._filter("Report attached.\nBest\u00a0regards\nAlice"),
+                         ["Report attached."])
+
+
 class TestExtractFirstSentences(unittest.TestCase):
     """Test _extract_first_sentences helper."""
 
@@ -149,6 +184,13 @@ class TestSummariseHeuristic(unittest.TestCase):
         self.assertIn("delivery date", result)
         self.assertNotIn("Sales Manager", result)
 
+    def test_long_body_within_limit(self):
+        body = ("The quarterly planning review covers budgets, hiring and "
+                "the roadmap for every team in the organisation ") * 20
+        result = email_summary.summarise_heuristic(body)
+        self.assertTrue(result.endswith("..."))
+        self.assertLessEqual(len(result), email_summary.MAX_DESCRIPTION_LEN)
+
 
 class TestGenerateSummary(unittest.TestCase):
     """Test the main generate_summary function."""
@@ -265,6 +307,158 @@ class TestYamlEscape(unittest.TestCase):
         self.assertIn('\\"', result)
 
 
+class TestJsonlMode(unittest.TestCase):
+    """Test --jsonl streaming mode."""
+
+    def _run(self, stdin_text):
+        old_stdin, old_stdout = sys.stdin, sys.stdout
+        sys.stdin, sys.stdout = io.StringIO(stdin_text), io.StringIO()
+        try:
+            rc = email_summary._run_jsonl("heuristic")
+            return rc, sys.stdout.getvalue()
+        finally:
+            sys.stdin, sys.stdout = old_stdin, old_stdout
+
+    def test_records_summarised_in_order(self):
+        stdin_text = (
+            json.dumps({"path": "a.md", "body": "The invoice is attached."}) + "\n"
+            + json.dumps({"path": "b.md", "body": ""}) + "\n"
+        )
+        rc, out = self._run(stdin_text)
+        self.assertEqual(rc, 0)
+        records = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual([r["path"] for r in records], ["a.md", "b.md"])
+        self.assertIn("invoice", records[0]["summary"])
+        self.assertEqual(records[1]["summary"], "")
+
+    def test_invalid_line_skipped(self):
+        rc, out = self._run("not json\n")
+        self.assertEqual(rc, 1)
+        self.assertEqual(out, "")
+
+    def test_non_string_body_skipped(self):
+        stdin_text = "".join(
+            json.dumps(rec) + "\n" for rec in (
+                {"path": "num.md", "body": 42},
+                {"path": "list.md", "body": ["a"]},
+                ["not", "an", "object"],
+                {"path": "null.md", "body": None},
+                {"path": "ok.md", "body": "The invoice is attached."},
+            )
+        )
+        old_stderr, sys.stderr = sys.stderr, io.StringIO()
+        try:
+            rc, out = self._run(stdin_text)
+        finally:
+            sys.stderr = old_stderr
+        self.assertEqual(rc, 1)
+        records = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual([r["path"] for r in records], ["null.md", "ok.md"])
+
+
+class TestBatchMode(unittest.TestCase):
+    """Test --batch directory summarisation."""
+
+    def test_heuristic_batch_updates_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, body in (("a.md", "The invoice is attached."),
+                               ("b.md", "The meeting moved to Friday.")):
+                Path(tmp, name).write_text(
+                    f"---\ntitle: {name}\n---\n\n{body}\n", encoding="utf-8")
+
+            files = email_summary._resolve_batch_files(tmp)
+            self.assertEqual([Path(f).name for f in files], ["a.md", "b.md"])
+
+            old_stdout = sys.stdout
+            sys.stdout = io.StringIO()
+            try:
+                rc = email_summary._run_batch(tmp, "heuristic", update=True)
+                out = sys.stdout.getvalue()
+            finally:
+                sys.stdout = old_stdout
+
+            self.assertEqual(rc, 0)
+            records = [json.loads(line) for line in out.splitlines()]
+            self.assertEqual([r["method"] for r in records],
+                             ["heuristic", "heuristic"])
+            self.assertIn("description: The invoice is attached.",
+                          Path(tmp, "a.md").read_text(encoding="utf-8"))
+
+
+class TestSummaryCache(unittest.TestCase):
+    """Test the on-disk summary cache."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        email_summary._open_summary_cache(
+            os.path.join(self._tmp.name, "cache", "summaries.sqlite"))
+
+    def tearDown(self):
+        email_summary._summary_cache.close()
+        email_summary._summary_cache = None
+        self._tmp.cleanup()
+
+    def test_hit_skips_summarisation(self):
+        body = "The invoice is attached. Please pay by Friday."
+        first = email_summary.generate_summary_with_meta(body, "heuristic")
+        self.assertEqual(first[2], "heuristic")
+
+        key = email_summary._summary_cache_key(body, "heuristic")
+        email_summary._summary_cache.execute(
+            "UPDATE summaries SET summary = 'cached' WHERE key = ?", (key,))
+        self.assertEqual(
+            email_summary.generate_summary_with_meta(body, "heuristic"),
+            ("cached", first[1], "heuristic"))
+
+    def test_method_is_part_of_key(self):
+        body = "The meeting moved to Friday."
+        self.assertNotEqual(email_summary._summary_cache_key(body, "auto"),
+                            email_summary._summary_cache_key(body, "ollama"))
+
+
+class TestSummaryCacheCli(unittest.TestCase):
+    """Test that the CLI cache is opt-in and --no-cache bypasses it."""
+
+    def _run_cli(self, tmpdir, cache_path, *extra):
+        import subprocess
+
+        md_file = os.path.join(tmpdir, "email.md")
+        with open(md_file, "w", encoding="utf-8") as f:
+            f.write("---\nsubject: Test\n---\n\nThe invoice is attached.\n")
+        env = dict(os.environ, HOME=tmpdir)
+        env.pop("AIDEVOPS_EMAIL_SUMMARY_CACHE", None)
+        if cache_path is not None:
+            env["AIDEVOPS_EMAIL_SUMMARY_CACHE"] = cache_path
+        proc = subprocess.run(
+            [sys.executable, str(SCRIPTS_DIR / "email-summary.py"), md_file,
+             "--method", "heuristic", *extra],
+            capture_output=True, text=True, env=env,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertIn("invoice", proc.stdout)
+
+    def _sqlite_files(self, tmpdir):
+        return [name for _root, _dirs, files in os.walk(tmpdir)
+                for name in files if name.endswith(".sqlite")]
+
+    def test_no_cache_by_default(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._run_cli(tmpdir, None)
+            self.assertEqual(self._sqlite_files(tmpdir), [])
+
+    def test_cache_written_when_enabled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, "cache", "summaries.sqlite")
+            self._run_cli(tmpdir, cache_path)
+            self.assertTrue(os.path.isfile(cache_path))
+
+    def test_no_cache_flag_bypasses_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, "cache", "summaries.sqlite")
+            self._run_cli(tmpdir, cache_path, "--no-cache")
+            self.assertFalse(os.path.exists(cache_path))
+
+
 class TestParseSummaryResponse(unittest.TestCase):
     """Test LLM response parsing."""
 
@@ -286,11 +480,140 @@ class TestParseSummaryResponse(unittest.TestCase):
         )
         self.assertEqual(result, "The project deadline has been extended.")
 
+    def test_internal_whitespace_collapsed(self):
+        result = email_summary._parse_summary_response(
+            "The invoice\tis  overdue."
+        )
+        self.assertEqual(result, "The invoice is overdue.")
+
     def test_long_response_truncated(self):
         long_text = "Word " * 100
         result = email_summary._parse_summary_response(long_text)
         self.assertLessEqual(len(result), email_summary.MAX_DESCRIPTION_LEN + 3)
 
+    def test_lead_in_only_is_empty(self):
+        for response in ("Here is a summary of the email in 1-2 sentences:",
+                         "Here is a summary of the email", "Summary:"):
+            with self.subTest(response=response):
+                self.assertEqual(
+                    email_summary._parse_summary_response(response), "")
+
+
+class TestOllamaSummaryPayload(unittest.TestCase):
+    """Test the shared Ollama summary request body."""
+
+    def test_generation_options_sent(self):
+        import email_shared
+
+        payload = json.loads(email_shared.ollama_summary_payload(
+            "llama3.2", "Summarise this.", "30m", ["\n\n"]))
+        self.assertEqual(payload["model"], "llama3.2")
+        self.assertFalse(payload["stream"])
+        self.assertEqual(payload["options"],
+                         {**email_shared.OLLAMA_SUMMARY_OPTIONS, "stop": ["\n\n"]})
+        self.assertIn("num_predict", payload["options"])
+
+    def test_stop_sequences_match_each_prompt(self):
+        import email_md_summary
+        import email_summary_heuristic
+
+        for label in email_summary_heuristic._OLLAMA_SUMMARY_STOP[1:]:
+            self.assertIn(label, email_summary_heuristic._OLLAMA_SUMMARY_PROMPT)
+        self.assertEqual(email_md_summary._OLLAMA_STOP,
+                         ["\n\n", "Subject:", "Body:"])
+
+    def test_lead_in_detected(self):
+        import email_shared
+
+        self.assertTrue(email_shared.is_summary_lead_in(
+            "Here is a summary of the email in 1-2 sentences:"))
+        self.assertTrue(email_shared.is_summary_lead_in("Here's a summary"))
+        self.assertFalse(email_shared.is_summary_lead_in(
+            "Here is a summary: The deadline has moved."))
+        self.assertFalse(email_shared.is_summary_lead_in(
+            "The sender requests a meeting."))
+
+    def test_numeric_keep_alive_sent_as_number(self):
+        import email_shared
+
+        for value, expected in (("-1", -1), ("300", 300), ("30m", "30m")):
+            with self.subTest(value=value):
+                payload = json.loads(email_shared.ollama_summary_payload(
+                    "llama3.2", "Summarise this.", value, []))
+                self.assertEqual(payload["keep_alive"], expected)
+        self.assertEqual(email_shared.ollama_keep_alive_cli("-1"), "-1s")
+        self.assertEqual(email_shared.ollama_keep_alive_cli("30m"), "30m")
+
+
+class TestDedupLog(unittest.TestCase):
+    """Test the append-only .jsonl dedup registry."""
+
+    def test_pickle_and_copy_give_plain_dict(self):
+        import copy
+        import pickle
+
+        import email_parser
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_path = os.path.join(tmpdir, "registry.jsonl")
+            registry = email_parser.load_dedup_registry(log_path)
+            registry["abc"] = "/tmp/a.pdf"
+            registry.close()
+
+            registry = email_parser.load_dedup_registry(log_path)
+            self.assertIsInstance(registry, email_parser.DedupLog)
+            for clone in (pickle.loads(pickle.dumps(registry)),
+                          copy.copy(registry), copy.deepcopy(registry)):
+                self.assertIs(type(clone), dict)
+                self.assertEqual(clone, {"abc": "/tmp/a.pdf"})
+            # Copies must not append to the original log
+            with open(log_path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+
+class TestParallelBatchDedup(unittest.TestCase):
+    """Test --batch on a process pool with a shared .jsonl dedup registry."""
+
+    def _write_emails(self, tmpdir, count):
+        from email.message import EmailMessage
+
+        for i in range(count):
+            msg = EmailMessage()
+            msg["From"] = "alice@example.com"
+            msg["To"] = "bob@example.com"
+            msg["Subject"] = f"Report {i}"
+            msg["Message-ID"] = f"<report-{i}@example.com>"
+            msg["Date"] = f"Mon, {i + 1:02d} Jan 2024 10:00:00 +0000"
+            msg.set_content("Quarterly report attached.")
+            msg.add_attachment(b"same bytes in every email",
+                               maintype="application", subtype="pdf",
+                               filename="report.pdf")
+            with open(os.path.join(tmpdir, f"e{i:02d}.eml"), "wb") as f:
+                f.write(msg.as_bytes())
+
+    def test_parallel_batch_twice_with_jsonl_registry(self):
+        import subprocess
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._write_emails(tmpdir, 6)
+            registry = os.path.join(tmpdir, "registry.jsonl")
+            cmd = [sys.executable, str(SCRIPTS_DIR / "email-to-markdown.py"),
+                   tmpdir, "--batch", "--jobs", "2", "--summary-mode", "off",
+                   "--dedup-registry", registry]
+            for run in (1, 2):
+                proc = subprocess.run(cmd, capture_output=True, text=True)
+                self.assertEqual(proc.returncode, 0, f"run {run}: {proc.stderr}")
+                self.assertNotIn("ERROR", proc.stderr, f"run {run}")
+                self.assertIn("Processed 6/6 emails", proc.stdout)
+
+            with open(registry, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f]
+            self.assertEqual(len({e["hash"] for e in entries}), 1)
+            links = [name for name in os.listdir(tmpdir)
+                     if os.path.islink(os.path.join(tmpdir, name,
+                                                    "report.pdf"))]
+            self.assertEqual(len(links), 5)
+
 
 class TestIntegrationWithEmailToMarkdown(unittest.TestCase):
     """Test that email-to-markdown.py correctly uses auto-summary."""
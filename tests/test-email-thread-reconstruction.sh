@@ -246,6 +246,124 @@ test_relative_paths_cross_directory() {
 	return 0
 }
 
+test_branching_reply_order() {
+	print_info "Test: Replies are listed directly under their parent"
+
+	local branch_dir="${TEST_DIR}/branch"
+	mkdir -p "$branch_dir"
+
+	# a <- b <- d, and a <- c; c is newer than d, so breadth-first order
+	# (a b c d) differs from the nested depth-first listing (a b d c)
+	local name parent date
+	for spec in "a::01" "b:a:02" "d:b:03" "c:a:04"; do
+		IFS=: read -r name parent date <<<"$spec"
+		{
+			printf -- '---\nsubject: "%s"\n' "$name"
+			printf 'date_sent: "2026-02-%sT09:00:00+0000"\n' "$date"
+			printf 'message_id: "<%s@test.com>"\n' "$name"
+			[[ -n "$parent" ]] && printf 'in_reply_to: "<%s@test.com>"\n' "$parent"
+			printf -- '---\n\nBody\n'
+		} >"${branch_dir}/${name}.md"
+	done
+
+	if ! python3 "$THREAD_RECON_SCRIPT" "$branch_dir" >/dev/null 2>&1; then
+		print_error "Thread reconstruction failed for branching thread"
+		return 1
+	fi
+
+	local order
+	order=$(grep -oE '\([a-d]\.md\)' "${branch_dir}/thread-index.md" | cut -c2 | tr -d '\n')
+	if [[ "$order" != "abdc" ]]; then
+		print_error "Expected depth-first reply order abdc, got $order"
+		return 1
+	fi
+	if ! grep -q "thread_position: 2" "${branch_dir}/d.md"; then
+		print_error "d.md: thread_position should be 2"
+		return 1
+	fi
+
+	rm -rf "$branch_dir"
+
+	print_success "Branching replies listed in depth-first order"
+	return 0
+}
+
+test_duplicate_id_cycle() {
+	print_info "Test: Duplicate message-ids forming a reply cycle terminate"
+
+	local cycle_dir="${TEST_DIR}/cycle"
+	mkdir -p "$cycle_dir"
+
+	# x1 and x2 share a message-id; x2 replies to y, which replies to x,
+	# so the reply links loop back on themselves
+	local name msgid parent date
+	for spec in "x1:x::01" "x2:x:y:02" "y:y:x:03"; do
+		IFS=: read -r name msgid parent date <<<"$spec"
+		{
+			printf -- '---\nsubject: "%s"\n' "$name"
+			printf 'date_sent: "2026-02-%sT09:00:00+0000"\n' "$date"
+			printf 'message_id: "<%s@test.com>"\n' "$msgid"
+			[[ -n "$parent" ]] && printf 'in_reply_to: "<%s@test.com>"\n' "$parent"
+			printf -- '---\n\nBody\n'
+		} >"${cycle_dir}/${name}.md"
+	done
+
+	if ! timeout 30 python3 "$THREAD_RECON_SCRIPT" "$cycle_dir" >/dev/null 2>&1; then
+		print_error "Thread reconstruction failed or hung on a reply cycle"
+		return 1
+	fi
+	for name in x1 x2 y; do
+		if ! grep -q "^thread_id:" "${cycle_dir}/${name}.md"; then
+			print_error "${name}.md: should be assigned to a thread"
+			return 1
+		fi
+	done
+
+	rm -rf "$cycle_dir"
+
+	print_success "Reply cycle traversed once"
+	return 0
+}
+
+test_crlf_file_without_frontmatter() {
+	print_info "Test: Large CRLF file without frontmatter is skipped"
+
+	local crlf_dir="${TEST_DIR}/crlf"
+	mkdir -p "$crlf_dir"
+	cp "${TEST_DIR}/email1.md" "$crlf_dir/"
+
+	# 8 KiB+ of CRLF text with no frontmatter and a two-byte UTF-8
+	# character straddling the 8192-byte head chunk
+	# (notes.md), also with openers that start with "---" but are not a
+	# frontmatter delimiter (rule.md, key.md)
+	python3 - "$crlf_dir" <<'PYEOF'
+import os
+import sys
+for name, head in (("notes.md", b"Notes\r\n"), ("rule.md", b"-----\r\n"),
+                   ("key.md", b"-----BEGIN PGP MESSAGE-----\r\n")):
+    data = head + b"x" * (8191 - len(head)) + "\u00e9".encode() + b"\r\nmore\r\n" * 100
+    with open(os.path.join(sys.argv[1], name), "wb") as f:
+        f.write(data)
+PYEOF
+
+	if ! python3 "$THREAD_RECON_SCRIPT" "$crlf_dir" >/dev/null 2>&1; then
+		print_error "Thread reconstruction failed on CRLF file without frontmatter"
+		return 1
+	fi
+	local name
+	for name in notes rule key; do
+		if grep -q "^thread_id:" "${crlf_dir}/${name}.md"; then
+			print_error "${name}.md: file without frontmatter should not be updated"
+			return 1
+		fi
+	done
+
+	rm -rf "$crlf_dir"
+
+	print_success "CRLF file without frontmatter skipped"
+	return 0
+}
+
 # =============================================================================
 # Main
 # =============================================================================
@@ -262,6 +380,9 @@ main() {
 	test_thread_index_content || failed=$((failed + 1))
 	test_trailing_newline || failed=$((failed + 1))
 	test_relative_paths_cross_directory || failed=$((failed + 1))
+	test_branching_reply_order || failed=$((failed + 1))
+	test_crlf_file_without_frontmatter || failed=$((failed + 1))
+	test_duplicate_id_cycle || failed=$((failed + 1))
 
 	cleanup_test_data
 